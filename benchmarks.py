@@ -0,0 +1,336 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from time import perf_counter_ns
+
+from context import ProfiSafeHostContext
+from helper.gsdml_cache import cache_path, file_digest, load_device
+from helper.gsdml_parser import XMLDevice
+from helper.pcap_reader import iter_frames
+from messages.pnio_rt import parse_data_message, parse_raw_data_message
+from messages.pnio_safe import get_profisafe_pdu, write_profisafe_pdu
+from runtime import ProfiSafeHostRuntime
+from states import PREPARE_MESSAGE_INIT, checkCRC, extractStatusByteData
+from transport import QueueFrameTransport
+
+CAPTURE = "./sniff/only_status_msgs.pcap"
+GSDML_FILES = ("./gsdml/test_project.xml", "./gsdml/test_project_2.xml")
+CRC1 = 0x22FF
+SCALING_CONNECTIONS = (1, 10, 100, 1000)
+SCALING_FRAMES = 100  # frames replayed per connection
+REGRESSION_THRESHOLD = 0.1  # median slowdown reported as a regression
+
+# compiled GSDML cache of the benchmarks, removed on exit. Results neither
+# depend on nor touch the user's cache (helper.gsdml_cache.DEFAULT_CACHE_DIR).
+_CACHE = tempfile.TemporaryDirectory(prefix="profisafe-benchmarks-")
+CACHE_DIR = _CACHE.name
+
+# benchmark name -> (setup, items per call), filled by @benchmark
+BENCHMARKS = {}
+
+
+def benchmark(name, items=1):
+    """Registers a benchmark.
+
+    The decorated function does the setup and returns the callable to time.
+    items is the number of operations one call performs, results are
+    reported per operation.
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = (setup, items)
+        return setup
+
+    return register
+
+
+def measure(func, repeat=7, min_round_ns=20_000_000):
+    # calls func in rounds of number calls, number is raised until a round
+    # takes min_round_ns, like timeit.Timer.autorange()
+    number = 1
+    while True:
+        start = perf_counter_ns()
+        for _ in range(number):
+            func()
+        duration = perf_counter_ns() - start
+        if duration >= min_round_ns:
+            break
+        number *= 10 if duration * 10 < min_round_ns else 2
+
+    rounds = []
+    for _ in range(repeat):
+        start = perf_counter_ns()
+        for _ in range(number):
+            func()
+        rounds.append((perf_counter_ns() - start) / number)
+    return number, rounds
+
+
+def load_frames():
+    return [bytes(frame) for frame in iter_frames(CAPTURE)]
+
+
+def _new_context():
+    context = ProfiSafeHostContext(
+        state=PREPARE_MESSAGE_INIT, crc1=CRC1, dataLength=8, seed_zero=True
+    )
+    context.prepareMessage(None)
+    return context
+
+
+def _device_pdus():
+    device = load_device(GSDML_FILES[0], CACHE_DIR)
+    return [
+        parse_raw_data_message(frame, device).input_data["data"][0]
+        for frame in load_frames()
+    ]
+
+
+@benchmark("crc.check_crc")
+def bench_check_crc():
+    pdu = bytes(_device_pdus()[0])
+    return lambda: checkCRC(pdu, 3, CRC1, 0)
+
+
+@benchmark("crc.write_profisafe_pdu")
+def bench_write_profisafe_pdu():
+    # process data, CRC computed every call
+    block = bytearray(12)
+    data = bytes([0xC3, 0x7E, 0, 0xFF, 0, 0, 0, 0])
+    return lambda: write_profisafe_pdu(block, 0, 0x22, data, CRC1, 5)
+
+
+@benchmark("crc.write_profisafe_pdu_constant")
+def bench_write_profisafe_pdu_constant():
+    # fail-safe values, payload CRC served from the constant payload cache
+    block = bytearray(12)
+    data = bytes(8)
+    return lambda: write_profisafe_pdu(block, 0, 0x22, data, CRC1, 5, constant=True)
+
+
+@benchmark("crc.get_profisafe_pdu")
+def bench_get_profisafe_pdu():
+    data = [0xC3, 0x7E, 0, 0xFF, 0, 0, 0, 0]
+    return lambda: get_profisafe_pdu(0x22, data, CRC1, 5)
+
+
+@benchmark("status.extract_status_byte")
+def bench_extract_status_byte():
+    return lambda: extractStatusByteData(0x25)
+
+
+def _capture_size():
+    return len(load_frames())
+
+
+@benchmark("frame.parse_data_message", items=_capture_size)
+def bench_parse_data_message():
+    from scapy.layers.l2 import Ether
+
+    device = load_device(GSDML_FILES[0], CACHE_DIR)
+    packets = [Ether(frame) for frame in load_frames()]
+
+    def run():
+        for packet in packets:
+            parse_data_message(packet, device)
+
+    return run
+
+
+@benchmark("frame.parse_raw_data_message", items=_capture_size)
+def bench_parse_raw_data_message():
+    device = load_device(GSDML_FILES[0], CACHE_DIR)
+    frames = load_frames()
+
+    def run():
+        for frame in frames:
+            parse_raw_data_message(frame, device)
+
+    return run
+
+
+@benchmark("cycle.update_data", items=_capture_size)
+def bench_update_data():
+    # replays the capture through a fresh context: updateData() runs the
+    # states down to prepareMessage() of the answer PDU
+    pdus = _device_pdus()
+
+    def run():
+        context = _new_context()
+        for pdu in pdus:
+            context.updateData(pdu)
+
+    return run
+
+
+for _path in GSDML_FILES:
+    _name = os.path.splitext(os.path.basename(_path))[0]
+
+    @benchmark(f"gsdml.parse.{_name}")
+    def bench_gsdml_parse(path=_path):
+        return lambda: XMLDevice(path)
+
+    @benchmark(f"gsdml.load_cold.{_name}")
+    def bench_gsdml_load_cold(path=_path):
+        # empty cache: hash, parse and write the compiled device
+        cache_dir = os.path.join(CACHE_DIR, "cold")
+        compiled = cache_path(file_digest(path), cache_dir)
+
+        def run():
+            if os.path.exists(compiled):
+                os.remove(compiled)
+            load_device(path, cache_dir)
+
+        return run
+
+    @benchmark(f"gsdml.load_warm.{_name}")
+    def bench_gsdml_load_warm(path=_path):
+        # hash and unpickle the compiled device
+        cache_dir = os.path.join(CACHE_DIR, "warm")
+        load_device(path, cache_dir)  # fills the cache
+        return lambda: load_device(path, cache_dir)
+
+
+for _connections in SCALING_CONNECTIONS:
+
+    @benchmark(
+        f"scaling.runtime_{_connections}_connections",
+        items=_connections * SCALING_FRAMES,
+    )
+    def bench_runtime_scaling(connections=_connections):
+        # the start of the capture replayed once per connection, frames
+        # interleaved as a host sees them, each connection under its own
+        # FrameID. Setting up the connections is part of every call.
+        device = load_device(GSDML_FILES[0], CACHE_DIR)
+        frames = load_frames()[:SCALING_FRAMES]
+        frame_ids = [0x8000 + index for index in range(connections)]
+        retagged = []
+        for frame in frames:
+            for frame_id in frame_ids:
+                copy = bytearray(frame)
+                copy[14:16] = frame_id.to_bytes(2, "big")
+                retagged.append(bytes(copy))
+
+        def run():
+            runtime = ProfiSafeHostRuntime(QueueFrameTransport())
+            runtime.transport.send = lambda frame_id, pdu, peer: None
+            for frame_id in frame_ids:
+                runtime.add_connection(frame_id, device, crc1=CRC1)
+            handle_frame = runtime.handle_frame
+            for frame in retagged:
+                handle_frame(frame, None)
+
+        return run
+
+
+def run_benchmarks(selected=None, repeat=7):
+    results = {}
+    for name, (setup, items) in BENCHMARKS.items():
+        if selected and not any(part in name for part in selected):
+            continue
+        func = setup()
+        items = items() if callable(items) else items
+        number, rounds = measure(func, repeat=repeat)
+        per_item = [value / items for value in rounds]
+        results[name] = {
+            "items": items,
+            "number": number,
+            "rounds": repeat,
+            "min_ns": min(per_item),
+            "median_ns": statistics.median(per_item),
+            "mean_ns": statistics.fmean(per_item),
+            "stdev_ns": statistics.stdev(per_item) if repeat > 1 else 0.0,
+        }
+        print(
+            f"{name:<45} {results[name]['median_ns']:>14.1f} ns/op",
+            file=sys.stderr,
+        )
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "commit": _commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(old, new):
+    # (name, old median, new median, ratio) of the benchmarks present in
+    # both result files
+    changes = []
+    for name, result in new["benchmarks"].items():
+        previous = old["benchmarks"].get(name)
+        if previous is None:
+            continue
+        ratio = result["median_ns"] / previous["median_ns"]
+        changes.append((name, previous["median_ns"], result["median_ns"], ratio))
+    return changes
+
+
+def main():
+    """Usage: benchmarks.py [output.json] [--compare old.json] [-k name]...
+
+    Runs the benchmarks whose name contains one of the -k parts (all by
+    default) and writes the results as JSON, named after the current commit
+    if no output file is given. With --compare the medians are compared to
+    an earlier result file and the exit code is 1 if one got slower by more
+    than REGRESSION_THRESHOLD.
+    """
+    args = sys.argv[1:]
+    selected = []
+    baseline = None
+    output = None
+    while args:
+        arg = args.pop(0)
+        if arg == "-k":
+            selected.append(args.pop(0))
+        elif arg == "--compare":
+            baseline = args.pop(0)
+        else:
+            output = arg
+
+    results = {"environment": environment(), "benchmarks": run_benchmarks(selected)}
+    if output is None:
+        output = f"benchmarks-{results['environment']['commit'] or 'local'}.json"
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"results written to {output}", file=sys.stderr)
+
+    if baseline is not None:
+        with open(baseline) as file:
+            old = json.load(file)
+        regressions = 0
+        for name, old_ns, new_ns, ratio in compare(old, results):
+            marker = ""
+            if ratio > 1 + REGRESSION_THRESHOLD:
+                marker = "  REGRESSION"
+                regressions += 1
+            print(f"{name:<45} {old_ns:>12.1f} -> {new_ns:>12.1f} ns{marker}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,87 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+import logging
 import uuid
+from helper.gsdml_cache import load_device
 from helper.gsdml_parser import XMLDevice
+from helper.pcap_reader import iter_frames
+from helper.shm_ring import ProcessImageRing
+from helper.timer_wheel import TimerWheel
+from helper.transition_trace import TransitionTrace
+from messages.pnio_rt import (
+    PNIOPSMessage,
+    parse_data_message,
+    parse_raw_data_message,
+)
+from messages.pnio_safe import profisafe_pdu_view
+from messages.profisafe_codec import decode_status_byte
+from messages.profisafe_crc import CRC2State
 from scapy.all import *
 from scapy.contrib.pnio_rpc import *
 from scapy.contrib.dce_rpc import *
 from scapy.contrib.pnio import *
-from states import *
 
 load_contrib("pnio")
 load_contrib("pnio_rpc")
 load_contrib("dce_rpc")
 
 
+# Fault bits stored in ProfiSafeHostContext.faults
+FAULT_HOST_CE_CRC = 0x1  # host detected a CRC error
+FAULT_CE_CRC = 0x2  # F-Device detected a CRC error
+FAULT_WD_TIMEOUT = 0x4  # watchdog of the F-Device expired
+
+
 class ProfiSafeHostContext:
 
-    _state = None
+    # one context per F-connection, so keep the instances compact
+    __slots__ = (
+        "_state",
+        "crc1",
+        "dataLength",
+        "x",
+        "old_x",
+        "oa_c_e",
+        "oa_c",
+        "crcLength",
+        "crc_state",
+        "activate_FV",
+        "activate_FV_S",
+        "FV_activated_S",
+        "activate_FV_C",
+        "FV_activated_C",
+        "ipar_ok_s",
+        "ipar_ok",
+        "ipar_en",
+        "oa_req",
+        "r_cons_nr",
+        "use_to2",
+        "FV_activated",
+        "toggle_h",
+        "faults",
+        "i_par_ok_s",
+        "oa_req_s",
+        "host_timer",
+        "lastStatus",
+        "profisafe_block",
+        "pdus",
+        "data",
+        "trace",
+    )
 
     def __init__(
-        self, state: PSState, crc1: int, dataLength: int, seed_zero: bool = True
+        self,
+        state: PSState,
+        crc1: int,
+        dataLength: int,
+        seed_zero: bool = True,
+        trace: TransitionTrace = None,
+        watchdog: TimerWheel = None,
+        wd_time: int = 500,
     ) -> None:
-        self.setState(state)
+        # optional transition history, None keeps setState free of tracing
+        self.trace = trace
+        self._state = None
         self.crc1 = crc1
         self.dataLength = dataLength
 
@@ -37,6 +98,9 @@ class ProfiSafeHostContext:
         # Length of CRC
         self.crcLength = 3 if seed_zero else 4
 
+        # CRC2 state with cached VCN encoding for x and x + 1
+        self.crc_state = CRC2State(crc1, self.crcLength)
+
         # Fail-Safe Bits are important if FV Status is currently active
         # important for inforamation if FailSafe Values are used
         # for now not that important
@@ -60,199 +124,156 @@ class ProfiSafeHostContext:
 
         # Status Byte Parameters
         # only error cases are relenvant
-        self.faults = {"Host_CE_CRC": False, "CE_CRC": False, "WD_timeout": False}
+        self.faults = 0  # FAULT_* bits
         self.i_par_ok_s = 0  # F-Device has new iParameter values assigned
         self.oa_req_s = (
             0  # varibale in F-Device which is 1 if failure occures until oa_c received
         )
 
-        # that's important for watchdog but not important now
+        # host watchdog (F_WD_Time in ms), restarted with every received PDU
+        # and firing timeout() once it expires
         self.host_timer = (
-            None  # Here should be another lane defined in which the timer state works
+            None if watchdog is None else watchdog.create_timer(wd_time, self.timeout)
         )
         self.lastStatus = None
 
-        # pdu to send
-        self.profisafe_block = None
-        self.data = [0, 0, 0, 0, 0, 0, 0, 0]
+        # raw safety PDU to send (data, control byte, CRC2), rewritten in
+        # place by the states
+        self.profisafe_block = bytearray(self.dataLength + 1 + self.crcLength)
+        self.pdus = 0  # PDUs built so far
+        # F-Data (process outputs) sent with every regular PDU, see setData()
+        self.data = bytes(self.dataLength)
 
-    def setState(self, state: PSState):
+        self.setState(state)
+        if self.host_timer is not None:
+            self.host_timer.start()
 
-        print(f"PROFISAFE: Transitioning to {type(state).__name__}")
+    def setState(self, state: PSState):
+        if self.trace is not None:
+            self.trace.record(self._state, state, self.x, self.toggle_h, self.faults)
         self._state = state
-        self._state.context = self
 
     def getState(self):
         return self._state
 
     # State Methods
     # called every time Ack received
+    # the host watchdog is restarted by the states, only once a new valid
+    # PDU is accepted or a fault PDU is sent
     def updateData(self, data) -> None:
-        self._state.updateData(data)
+        self._state.updateData(self, data)
 
     def timeout(self) -> None:
-        self._state.timeout()
+        self._state.timeout(self)
 
     def prepareMessage(self, data):
-        self._state.prepareMessage(data)
+        self._state.prepareMessage(self, data)
+
+    # decodes the Status Byte of a received PDU for the states, a method so
+    # instrumented contexts can time it
+    extractStatus = staticmethod(decode_status_byte)
+
+    # one cycle between two ProcessImageRing instances: the received F-PDU
+    # is checked straight from its input slot and the states build the
+    # answer in place in the next output slot. A cycle without a new answer
+    # (e.g. a repeated F-Device PDU) publishes nothing, the I/O side keeps
+    # sending the last image. Returns False if no input image is waiting
+    # or the output ring is full.
+    def processImage(self, inputs, outputs) -> bool:
+        slot = outputs.reserve()
+        if slot is None:
+            return False
+        block = self.profisafe_block
+        pdus = self.pdus
+        try:
+            image = inputs.peek()
+            if image is None:
+                return False
+            self.profisafe_block = slot
+            try:
+                self.updateData(image)
+            finally:
+                self.profisafe_block = block
+                image.release()
+                inputs.release()
+        finally:
+            slot.release()
+        if self.pdus != pdus:
+            outputs.publish()
+        return True
 
     def setData(self, data):
-        self.data = data[0 : self.dataLength]
+        # kept as bytes, the CRC2 of the payload is cached per value
+        if len(data) < self.dataLength:
+            raise ValueError(
+                f"{len(data)} bytes of F-Data, the connection has {self.dataLength}"
+            )
+        self.data = bytes(data[0 : self.dataLength])
 
     def getProfisafeBlock(self):
         return self.profisafe_block
 
+    def getProfisafePacket(self):
+        # Scapy view of the PDU to send, for debugging
+        return profisafe_pdu_view(self.profisafe_block, self.crcLength)
+
     # Service Methods
 
 
+# States are stateless singletons (see states.py), everything that changes
+# lives in the context handed to each call
 class PSState(ABC):
-    @property
-    def context(self) -> ProfiSafeHostContext:
-        return self._context
-
-    @context.setter
-    def context(self, context: ProfiSafeHostContext) -> None:
-        self._context = context
-
     @abstractmethod
-    def updateData(self, controlByte) -> None:
+    def updateData(self, context: ProfiSafeHostContext, controlByte) -> None:
         pass
 
     @abstractmethod
-    def prepareMessage(self, data):
+    def prepareMessage(self, context: ProfiSafeHostContext, data):
         pass
 
     @abstractmethod
-    def timeout(self):
+    def timeout(self, context: ProfiSafeHostContext):
         pass
 
 
-class PNIOPSMessage:
-    def __init__(self) -> None:
-        self.cycle_counter = 0
-        self.data_status = {
-            "ignore": False,  # 1: Ignore 0: Evaluate
-            "reserved_2": False,  # should be zero
-            "station_problem_indicator": False,  # 1: Ok, 0: Problem
-            "provider_state": False,  # 1: Run 0: Stop
-            "reserved_1": False,  # should be zero
-            "data_valid": False,  # 1: Valid, 0: Invalid
-            "redundancy": False,  # has no meaning for outputCRs
-            "state": False,  # 1: primary, 0. backup
-        }
-        self.input_data = {"iops": [], "iocs": [], "data": []}
-
-    def convert_number_to_state_array(self, flags):
-        self.data_status = {
-            "ignore": flags.ignore,  # 1: Ignore 0: Evaluate
-            "reserved_2": flags.reserved_2,  # should be zero
-            "station_problem_indicator": flags.no_problem,  # 1: Ok, 0: Problem
-            "provider_state": flags.run,  # 1: Run 0: Stop
-            "reserved_1": flags.reserved_1,  # should be zero
-            "data_valid": flags.validData,  # 1: Valid, 0: Invalid
-            "redundancy": flags.redundancy,  # has no meaning for outputCRs
-            "state": flags.primary,  # 1: primary, 0. backup
-        }
-
-    def bitarray_to_number(self, array):
-        i = 0
-        for bit in array:
-            i = (i << 1) | bit
-        return i
-
-    def parse_io_state(self, state, slot, subslot):
-        status_array = [int(digit) for digit in bin(state + 0x100)[2:]][1:]
-        return {
-            "module": str(slot),
-            "submodule": str(subslot),
-            "data_state": bool(status_array[0]),  # 1: Good 0: Bad
-            "instance": self.bitarray_to_number(
-                status_array[1:3]
-            ),  # should be zero 0: Detected by subslot
-            "reserved": self.bitarray_to_number(status_array[3:7]),  # should be zero
-            "extension": bool(
-                status_array[7]
-            ),  # 0: No IOxS octet follows 1: IOxS octet follows
-        }
-
-    def parse_input_data(self, data, device):
-        usable_modules = device.body.dap_list[0].usable_modules
-
-        payload_bytes = list(data)
-
-        first_iops = self.parse_io_state(payload_bytes[0], 0x1, 0x1)
-
-        sec_iops = self.parse_io_state(payload_bytes[1], 0x1, 0x8000)
-
-        thir_iops = self.parse_io_state(payload_bytes[2], 0x1, 0x8001)
-
-        iops = [first_iops, sec_iops, thir_iops]
-        iocs = []
-        data = []
-
-        output_frame_offset = 3
-
-        for module in usable_modules:
-            if module.used_in_slots != "" and module.output_length != 0:
-                data.append(
-                    payload_bytes[
-                        output_frame_offset : (
-                            output_frame_offset + module.output_length
-                        )
-                    ]
-                )
-                iops.append(
-                    self.parse_io_state(
-                        payload_bytes[output_frame_offset + module.output_length],
-                        module.module_ident_number,
-                        module.submodule_ident_number,
-                    )
-                )
-                output_frame_offset += module.output_length + 1
-        for module in usable_modules:
-            if module.used_in_slots != "" and module.input_length != 0:
-                iocs.append(
-                    self.parse_io_state(
-                        payload_bytes[output_frame_offset],
-                        module.module_ident_number,
-                        module.submodule_ident_number,
-                    )
-                )
-                output_frame_offset += 1
-
-        self.input_data = {"iops": iops, "iocs": iocs, "data": data}
-
-
-def parse_data_message(packet, device):
-    message = PNIOPSMessage()
-
-    if packet.haslayer("PROFINET IO Real Time Cyclic Default Raw Data"):
-        pkt_rt = packet.getlayer("PROFINET Real-Time")
-        pkt_raw_layer = packet.getlayer("PROFINET IO Real Time Cyclic Default Raw Data")
-        message.convert_number_to_state_array(pkt_rt.dataStatus)
-        message.cycle_counter = pkt_rt.cycleCounter
-        message.parse_input_data(pkt_raw_layer.data, device)
-
-        return message
-
-    else:
-        return
+# states.py builds on the classes above, so it is imported last
+from states import *
 
 
 def main():
+    # the transition summary, set the "profisafe.transitions" logger to
+    # DEBUG for single (rate limited) transitions
+    logging.basicConfig(level=logging.INFO)
+    trace = TransitionTrace()
     context = ProfiSafeHostContext(
-        state=PrepareMessageInitState(), crc1=0x22FF, dataLength=8, seed_zero=True
+        state=PREPARE_MESSAGE_INIT,
+        crc1=0x22FF,
+        dataLength=8,
+        seed_zero=True,
+        trace=trace,
     )
 
     context.prepareMessage("None")
 
-    scapy_cap = rdpcap("./sniff/only_status_msgs.pcap")
-    device = XMLDevice("./gsdml/test_project.xml")
-
-    for packet in scapy_cap:
-        pdu = bytearray(parse_data_message(packet, device).input_data["data"][0])
-        context.updateData(pdu)
-        time.sleep(1)
+    device = load_device("./gsdml/test_project.xml")
+
+    # F-PDU size: F-Data, status/control byte and CRC2
+    image_size = context.dataLength + 1 + context.crcLength
+    inputs = ProcessImageRing.create(image_size, slots=16)
+    outputs = ProcessImageRing.create(image_size, slots=16)
+
+    try:
+        for frame in iter_frames("./sniff/only_status_msgs.pcap"):
+            message = parse_raw_data_message(frame, device)
+            inputs.push(message.input_data["data"][0])
+            context.processImage(inputs, outputs)
+            outputs.pop()
+            time.sleep(1)
+    finally:
+        inputs.close()
+        outputs.close()
+
+    trace.summarize()
 
 
 if __name__ == "__main__":
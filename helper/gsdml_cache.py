@@ -0,0 +1,73 @@
+import hashlib
+import logging
+import os
+import pickle
+
+from helper.gsdml_parser import PARSER_VERSION, XMLDevice
+
+logger = logging.getLogger("profisafe.gsdml")
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "PROFISAFE_GSDML_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "profisafe", "gsdml"),
+)
+
+
+def file_digest(path):
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def cache_path(digest, cache_dir=DEFAULT_CACHE_DIR):
+    return os.path.join(cache_dir, f"{digest}-v{PARSER_VERSION}.pickle")
+
+
+def load_device(path, cache_dir=DEFAULT_CACHE_DIR):
+    """XMLDevice of a GSDML file, compiled once and cached on disk.
+
+    Compiled devices are keyed by the SHA-256 of the file and the parser
+    version, so an edited file or a parser change is parsed again. The
+    cached device has no document (minidom tree), everything else is the
+    same as XMLDevice(path). A cache_dir of None disables the cache.
+    """
+    if cache_dir is None:
+        return XMLDevice(path)
+
+    compiled = cache_path(file_digest(path), cache_dir)
+    try:
+        with open(compiled, "rb") as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.warning("ignoring unreadable compiled GSDML %s", compiled)
+
+    device = XMLDevice(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # written under a temporary name so readers never see a partial file
+        temporary = f"{compiled}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump(device, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, compiled)
+    except OSError:
+        logger.warning("cannot cache compiled GSDML in %s", cache_dir)
+    return device
+
+
+def main():
+    import sys
+    import time
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "./gsdml/test_project.xml"
+    start = time.perf_counter()
+    XMLDevice(path)
+    print(f"parse: {(time.perf_counter() - start) * 1e3:8.2f} ms")
+    load_device(path)
+    start = time.perf_counter()
+    load_device(path)
+    print(f"cached: {(time.perf_counter() - start) * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import logging
+import os
+import sqlite3
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger("profisafe.gsdml")
+
+CatalogDevice = namedtuple(
+    "CatalogDevice", ["path", "vendor_id", "device_id", "info_text", "vendor_name"]
+)
+CatalogModule = namedtuple(
+    "CatalogModule",
+    [
+        "path",
+        "dap_id",
+        "module_id",
+        "module_ident_number",
+        "submodule_ident_number",
+        "input_length",
+        "output_length",
+        "profisafe_support",
+    ],
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS devices (
+    path TEXT PRIMARY KEY REFERENCES files(path) ON DELETE CASCADE,
+    vendor_id INTEGER,
+    device_id INTEGER,
+    info_text TEXT,
+    vendor_name TEXT
+);
+CREATE TABLE IF NOT EXISTS modules (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    dap_id TEXT NOT NULL,
+    module_id TEXT,
+    module_ident_number INTEGER,
+    submodule_ident_number INTEGER,
+    input_length INTEGER,
+    output_length INTEGER,
+    profisafe_support INTEGER
+);
+CREATE INDEX IF NOT EXISTS devices_ident ON devices (vendor_id, device_id);
+CREATE INDEX IF NOT EXISTS modules_ident
+    ON modules (module_ident_number, submodule_ident_number);
+CREATE INDEX IF NOT EXISTS modules_path ON modules (path);
+"""
+
+
+def _ident(value):
+    # ident numbers are hex strings in GSDML
+    return int(value, 16) if value else None
+
+
+def extract_entry(path):
+    """Catalog rows of one GSDML file, runs in the worker processes.
+
+    Returns (device, modules) with plain values only, so the result is
+    cheap to send back to the parent. The DAP itself is listed as module
+    with module_id None.
+    """
+    from helper.gsdml_parser import XMLDevice
+
+    device = XMLDevice(path)
+    identity = device.body.device_identity
+    daps = device.body.dap_list
+    entry = CatalogDevice(
+        path=path,
+        vendor_id=_ident(identity.vendor_id[0]),
+        device_id=_ident(identity.device_id[0]),
+        info_text=identity.info_text[0],
+        vendor_name=daps[0].module_info.vendor_name[0] if daps else "",
+    )
+    modules = []
+    for dap in daps:
+        modules.append(
+            CatalogModule(
+                path, dap.id, None, _ident(dap.module_ident_number), None, 0, 0, False
+            )
+        )
+        for module in dap.usable_modules:
+            modules.append(
+                CatalogModule(
+                    path=path,
+                    dap_id=dap.id,
+                    module_id=module.id,
+                    module_ident_number=module.module_ident_number,
+                    submodule_ident_number=module.submodule_ident_number,
+                    input_length=module.input_length,
+                    output_length=module.output_length,
+                    profisafe_support=module.profisafe_support,
+                )
+            )
+    return entry, modules
+
+
+def _extract(path):
+    # errors are reported per file instead of failing the whole scan
+    try:
+        return path, extract_entry(path), None
+    except Exception as error:
+        return path, None, f"{type(error).__name__}: {error}"
+
+
+def scan_directory(directory):
+    # path -> (mtime_ns, size) of every GSDML file below directory
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.lower().endswith(".xml"):
+                path = os.path.abspath(os.path.join(root, name))
+                stat = os.stat(path)
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class GSDMLCatalog:
+    """sqlite index over a library of GSDML files.
+
+    refresh() only parses files that are new or whose mtime or size
+    changed, in a process pool, and drops files that are gone. Lookups
+    go by VendorID/DeviceID or ModuleIdentNumber/SubmoduleIdentNumber.
+    """
+
+    def __init__(self, db_path):
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def refresh(self, directory, workers=None):
+        """Brings the index in line with directory.
+
+        Returns (parsed, removed, failed) file counts.
+        """
+        found = scan_directory(directory)
+        prefix = os.path.join(os.path.abspath(directory), "")
+        known = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in self.connection.execute(
+                "SELECT path, mtime_ns, size FROM files"
+            )
+            if path.startswith(prefix)
+        }
+        removed = [path for path in known if path not in found]
+        changed = sorted(path for path, stat in found.items() if known.get(path) != stat)
+
+        failed = 0
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM files WHERE path = ?", [(path,) for path in removed]
+            )
+            if changed:
+                workers = workers or os.cpu_count() or 1
+                chunksize = max(1, len(changed) // (4 * workers))
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    for path, result, error in pool.map(
+                        _extract, changed, chunksize=chunksize
+                    ):
+                        if error is not None:
+                            failed += 1
+                            logger.warning("cannot index %s: %s", path, error)
+                        self._store(path, found[path], result, error)
+        return len(changed), len(removed), failed
+
+    def _store(self, path, stat, result, error):
+        execute = self.connection.execute
+        # replacing the file row cascades to its device and modules
+        execute("DELETE FROM files WHERE path = ?", (path,))
+        execute(
+            "INSERT INTO files (path, mtime_ns, size, error) VALUES (?, ?, ?, ?)",
+            (path, stat[0], stat[1], error),
+        )
+        if result is None:
+            return
+        entry, modules = result
+        execute("INSERT INTO devices VALUES (?, ?, ?, ?, ?)", entry)
+        self.connection.executemany(
+            "INSERT INTO modules VALUES (?, ?, ?, ?, ?, ?, ?, ?)", modules
+        )
+
+    def find_devices(self, vendor_id, device_id=None):
+        query = "SELECT * FROM devices WHERE vendor_id = ?"
+        args = [vendor_id]
+        if device_id is not None:
+            query += " AND device_id = ?"
+            args.append(device_id)
+        return [CatalogDevice(*row) for row in self.connection.execute(query, args)]
+
+    def find_modules(self, module_ident_number, submodule_ident_number=None):
+        query = "SELECT * FROM modules WHERE module_ident_number = ?"
+        args = [module_ident_number]
+        if submodule_ident_number is not None:
+            query += " AND submodule_ident_number = ?"
+            args.append(submodule_ident_number)
+        return [
+            CatalogModule(*row[:-1], bool(row[-1]))
+            for row in self.connection.execute(query, args)
+        ]
+
+    def profisafe_modules(self):
+        return [
+            CatalogModule(*row[:-1], bool(row[-1]))
+            for row in self.connection.execute(
+                "SELECT * FROM modules WHERE profisafe_support"
+            )
+        ]
+
+    def failed_files(self):
+        return list(
+            self.connection.execute(
+                "SELECT path, error FROM files WHERE error IS NOT NULL"
+            )
+        )
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    directory = sys.argv[1] if len(sys.argv) > 1 else "./gsdml"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "gsdml_catalog.sqlite"
+    with GSDMLCatalog(db_path) as catalog:
+        parsed, removed, failed = catalog.refresh(directory)
+        print(f"parsed {parsed}, removed {removed}, failed {failed}")
+        for module in catalog.profisafe_modules():
+            print(module)
+
+
+if __name__ == "__main__":
+    main()
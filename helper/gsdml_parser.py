@@ -1,10 +1,112 @@
-from xml.dom import minidom
-from xml.dom.minidom import parse, Node
+import copy
+from collections import namedtuple
+from functools import cached_property
+from xml.dom import Node
+from xml.etree.ElementTree import iterparse
 
 from numpy import record
 
+from messages.profisafe_crc import FParameters
+
 BYTE_SIZE = {"Unsigned8": 1, "F_MessageTrailer4Byte": 4}
 
+# bump whenever the parsed object model changes, invalidates compiled
+# devices cached by helper.gsdml_cache
+PARSER_VERSION = 3
+
+# GSDML values of the F-Parameters and their coding in the F-Parameter block
+F_PARAMETER_CODES = {
+    "F_Check_SeqNr": {"NoCheck": 0, "Check": 1},
+    "F_Check_iPar": {"NoCheck": 0, "Check": 1},
+    "F_SIL": {"SIL1": 0, "SIL2": 1, "SIL3": 2, "NoSIL": 3},
+    "F_CRC_Length": {"3-Byte-CRC": 0, "2-Byte-CRC": 1, "4-Byte-CRC": 2},
+    "F_CRC_Seed": {"CRC-Seed16": 0, "CRC-Seed24/32": 1},
+    "F_Passivation": {"Device/Module": 0, "Channel": 1},
+}
+
+
+# Sections of a GSDML the object model does not use. Their elements are
+# dropped while parsing, the text lists usually make up most of a file.
+SKIPPED_ELEMENTS = frozenset(
+    (
+        "ExternalTextList",
+        "GraphicsList",
+        "CategoryList",
+        "ValueList",
+        "ChannelDiagList",
+        "UnitDiagTypeList",
+        "LogBookEntryList",
+    )
+)
+
+
+class _Text:
+    __slots__ = ("nodeValue",)
+
+    def __init__(self, value):
+        self.nodeValue = value
+
+
+class _Element:
+    """The part of the minidom element API the XML* classes use, on top of
+    an ElementTree element."""
+
+    __slots__ = ("element",)
+
+    nodeType = Node.ELEMENT_NODE
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def nodeName(self):
+        return self.element.tag
+
+    @property
+    def firstChild(self):
+        return _Text(self.element.text)
+
+    @property
+    def childNodes(self):
+        return [_Element(child) for child in self.element]
+
+    def getAttribute(self, name):
+        return self.element.get(name, "")
+
+    def getElementsByTagName(self, name):
+        # descendants only, like minidom
+        element = self.element
+        return [_Element(child) for child in element.iter(name) if child is not element]
+
+
+def parse_gsdml(path, handlers=None):
+    """Parses a GSDML file in a single iterparse pass.
+
+    Namespaces are stripped from the tags and skipped sections are cleared
+    as soon as they end. handlers maps tags to callables that get every
+    such element as minidom-like _Element once it has ended, the element
+    is cleared right after, so only what a handler extracted stays in
+    memory. Returns the root (without the cleared parts) as _Element.
+    """
+    handlers = handlers or {}
+    root = None
+    for event, element in iterparse(path, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            continue
+        tag = element.tag
+        if tag[0] == "{":
+            tag = element.tag = tag.rpartition("}")[2]
+        if tag in SKIPPED_ELEMENTS:
+            element.clear()
+            continue
+        handler = handlers.get(tag)
+        if handler is not None:
+            handler(_Element(element))
+            element.clear()
+    return _Element(root)
+
 
 class XMLIsoReference:
     def __init__(self, iso_ref_object):
@@ -46,107 +148,106 @@ class XMLProfileHeader:
 
 
 class XMLProfileBody:
-    def __init__(self, xml_body):
-        xml_device_id_object = xml_body.getElementsByTagName("DeviceIdentity")[0]
-
-        xml_application_process_object = xml_body.getElementsByTagName(
-            "ApplicationProcess"
-        )[0]
-        xml_device_access_point_list_object = (
-            xml_application_process_object.getElementsByTagName(
-                "DeviceAccessPointList"
-            )[0]
-        )
+    """ProfileBody of a GSDML, built while parse_gsdml() reads the file.
+
+    DAPs and ModuleItems are converted as soon as their element has been
+    read (see handlers()), the parser clears them afterwards. DAPs come
+    before the ModuleList, so their ModuleItemRefs are resolved in
+    finish() through the ModuleItem ID index filled on the way.
+    """
 
+    def __init__(self):
         self.dap_list = []
+        self.device_identity = None
+        self._modules = {}  # ModuleItem ID -> XMLModuleItem, until finish()
+        self._module_refs = []  # ModuleItemRefs per DAP, until finish()
+
+    def handlers(self):
+        return {
+            "DeviceAccessPointItem": self.add_device_access_point,
+            "ModuleItem": self.add_module,
+        }
+
+    def add_module(self, xml_module_item_object):
+        self._modules[xml_module_item_object.getAttribute("ID")] = XMLModuleItem(
+            xml_module_item_object
+        )
 
-        for (
-            xml_device_access_point_item_object
-        ) in xml_application_process_object.getElementsByTagName(
-            "DeviceAccessPointItem"
-        ):
-            # DEVICE MODULE INFO
-            xml_device_access_point_item_module_info_object = (
-                xml_device_access_point_item_object.getElementsByTagName("ModuleInfo")[
-                    0
-                ]
-            )
+    def add_device_access_point(self, xml_device_access_point_item_object):
+        # DEVICE MODULE INFO
+        xml_device_access_point_item_module_info_object = (
+            xml_device_access_point_item_object.getElementsByTagName("ModuleInfo")[0]
+        )
 
-            xml_module_info = XMLDeviceItemModuleInfo(
-                xml_device_access_point_item_module_info_object
-            )
+        xml_module_info = XMLDeviceItemModuleInfo(
+            xml_device_access_point_item_module_info_object
+        )
 
-            # MODULE LIST
-            xml_device_access_point_usable_modules_object = (
-                xml_device_access_point_item_object.getElementsByTagName(
-                    "UseableModules"
-                )[0]
-            )
-            xml_device_access_point_modules_object = (
-                xml_application_process_object.getElementsByTagName("ModuleList")[0]
+        # MODULE LIST, resolved in finish()
+        xml_device_access_point_usable_modules_object = (
+            xml_device_access_point_item_object.getElementsByTagName(
+                "UseableModules"
+            )[0]
+        )
+        self._module_refs.append(
+            xml_device_access_point_usable_modules_object.getElementsByTagName(
+                "ModuleItemRef"
             )
+        )
 
-            xml_device_access_point_system_defined_submodule_list_object = (
-                xml_device_access_point_item_object.getElementsByTagName(
-                    "SystemDefinedSubmoduleList"
-                )[0]
-            )
+        xml_device_access_point_system_defined_submodule_list_object = (
+            xml_device_access_point_item_object.getElementsByTagName(
+                "SystemDefinedSubmoduleList"
+            )[0]
+        )
 
-            xml_device_access_point_interface_submodule_item_object = xml_device_access_point_system_defined_submodule_list_object.getElementsByTagName(
-                "InterfaceSubmoduleItem"
-            )[
-                0
-            ]
+        xml_device_access_point_interface_submodule_item_object = xml_device_access_point_system_defined_submodule_list_object.getElementsByTagName(
+            "InterfaceSubmoduleItem"
+        )[
+            0
+        ]
 
-            xml_device_access_point_port_submodule_item_object = xml_device_access_point_system_defined_submodule_list_object.getElementsByTagName(
-                "PortSubmoduleItem"
-            )[
-                0
-            ]
-
-            self.dap_list.append(
-                XMLDeviceAccessPointItem(
-                    id=xml_device_access_point_item_object.getAttribute("ID"),
-                    dns_compatible_name=xml_device_access_point_item_object.getAttribute(
-                        "DNS_CompatibleName"
-                    ),
-                    module_info=xml_module_info,
-                    usable_modules=self.calc_module_list(
-                        xml_device_access_point_usable_modules_object,
-                        xml_device_access_point_modules_object,
-                    ),
-                    interface_submodule_item=XMLInterfaceSubmoduleItem(
-                        xml_device_access_point_interface_submodule_item_object
-                    ),
-                    port_submodule_item=XMLPortSubmoduleItem(
-                        xml_device_access_point_port_submodule_item_object
-                    ),
-                )
+        xml_device_access_point_port_submodule_item_object = xml_device_access_point_system_defined_submodule_list_object.getElementsByTagName(
+            "PortSubmoduleItem"
+        )[
+            0
+        ]
+
+        self.dap_list.append(
+            XMLDeviceAccessPointItem(
+                id=xml_device_access_point_item_object.getAttribute("ID"),
+                dns_compatible_name=xml_device_access_point_item_object.getAttribute(
+                    "DNS_CompatibleName"
+                ),
+                module_info=xml_module_info,
+                usable_modules=[],
+                interface_submodule_item=XMLInterfaceSubmoduleItem(
+                    xml_device_access_point_interface_submodule_item_object
+                ),
+                port_submodule_item=XMLPortSubmoduleItem(
+                    xml_device_access_point_port_submodule_item_object
+                ),
+                module_ident_number=xml_device_access_point_item_object.getAttribute(
+                    "ModuleIdentNumber"
+                ),
             )
+        )
 
-        self.device_identity = XMLDeviceIdentity(xml_device_id_object)
+    def finish(self, xml_body):
+        # called once the whole file has been parsed
+        self.device_identity = XMLDeviceIdentity(
+            xml_body.getElementsByTagName("DeviceIdentity")[0]
+        )
+        for dap, item_refs in zip(self.dap_list, self._module_refs):
+            dap.usable_modules = self.calc_module_list(item_refs)
+        del self._modules, self._module_refs
 
-    def calc_module_list(
-        self,
-        xml_device_access_point_usable_modules_object,
-        xml_device_access_point_modules_object,
-    ):
+    def calc_module_list(self, item_refs):
         modules_list = []
-        for (
-            item_ref
-        ) in xml_device_access_point_usable_modules_object.getElementsByTagName(
-            "ModuleItemRef"
-        ):
-            for (
-                module_ref
-            ) in xml_device_access_point_modules_object.getElementsByTagName(
-                "ModuleItem"
-            ):
-                if module_ref.getAttribute("ID") == item_ref.getAttribute(
-                    "ModuleItemTarget"
-                ):
-
-                    modules_list.append(XMLModuleItem(module_ref, item_ref))
+        for item_ref in item_refs:
+            module = self._modules.get(item_ref.getAttribute("ModuleItemTarget"))
+            if module is not None:
+                modules_list.append(module.referenced(item_ref))
         return modules_list
 
 
@@ -193,100 +294,136 @@ class XMLDeviceItemModuleInfo:
 
 
 class XMLModuleItem:
-    def __init__(self, module_ref, item_ref):
-        xml_module_info_item = module_ref.getElementsByTagName("ModuleInfo")[0]
+    """Module of the ModuleList referenced by a DAP.
+
+    Only what the frame layout needs is read up front. Text references,
+    data item details, parameter records and F-Parameters are parsed on
+    first access, from the ModuleInfo, first DataItems and RecordDataList
+    subtrees kept for it. The rest of the module is cleared by the parser.
+    """
+
+    # parsed on first access, resolved before pickling
+    LAZY_ATTRIBUTES = (
+        "name",
+        "order_number",
+        "input_id",
+        "output_id",
+        "datatype",
+        "used_as_bits",
+        "parameters",
+        "f_parameters",
+    )
+
+    def __init__(self, module_ref):
         xml_submodule = module_ref.getElementsByTagName("VirtualSubmoduleList")[
             0
         ].getElementsByTagName("VirtualSubmoduleItem")[0]
-        xml_submodule_input = xml_submodule.getElementsByTagName("IOData")[
-            0
-        ].getElementsByTagName("Input")
-        xml_submodule_output = xml_submodule.getElementsByTagName("IOData")[
-            0
-        ].getElementsByTagName("Output")
         self.id = module_ref.getAttribute("ID")
         self.module_ident_number = int(module_ref.getAttribute("ModuleIdentNumber"), 16)
-        self.name = (
-            xml_module_info_item.getElementsByTagName("Name")[0].getAttribute("TextId"),
-        )
-        self.order_number = (
-            xml_module_info_item.getElementsByTagName("InfoText")[0].getAttribute(
-                "TextId"
-            ),
-        )
         self.submododule_id = xml_submodule.getAttribute("ID")
         self.submodule_ident_number = int(
             xml_submodule.getAttribute("SubmoduleIdentNumber"), 16
         )
-        self.input_length = (
-            0
-            if len(xml_submodule_input) == 0
-            else self.add_size_io_data(
-                xml_submodule_input[0].getElementsByTagName("DataItem")
-            )
-        )
-        self.output_length = (
-            0
-            if len(xml_submodule_output) == 0
-            else self.add_size_io_data(
-                xml_submodule_output[0].getElementsByTagName("DataItem")
-            )
-        )
-        self.input_id = (
-            ""
-            if len(xml_submodule_input) == 0
-            else xml_submodule_input[0]
-            .getElementsByTagName("DataItem")[0]
-            .getAttribute("TextId")
-        )
-        self.output_id = (
-            ""
-            if len(xml_submodule_output) == 0
-            else xml_submodule_output[0]
-            .getElementsByTagName("DataItem")[0]
-            .getAttribute("TextId")
-        )
-        self.datatype = (
-            xml_submodule_output[0]
-            .getElementsByTagName("DataItem")[0]
-            .getAttribute("DataType")
-            if len(xml_submodule_input) == 0
-            else xml_submodule_input[0]
-            .getElementsByTagName("DataItem")[0]
-            .getAttribute("DataType"),
-        )
-        self.used_as_bits = (
-            bool(
-                xml_submodule_output[0]
-                .getElementsByTagName("DataItem")[0]
-                .getAttribute("UseAsBits")
-                if len(xml_submodule_input) == 0
-                else xml_submodule_input[0]
-                .getElementsByTagName("DataItem")[0]
-                .getAttribute("UseAsBits")
+        io_data = xml_submodule.getElementsByTagName("IOData")[0]
+        inputs = io_data.getElementsByTagName("Input")
+        outputs = io_data.getElementsByTagName("Output")
+        input_items = inputs[0].getElementsByTagName("DataItem") if inputs else []
+        output_items = outputs[0].getElementsByTagName("DataItem") if outputs else []
+        self.input_length = self.add_size_io_data(input_items)
+        self.output_length = self.add_size_io_data(output_items)
+        self.allowed_in_slots = ""  # set per DAP, see referenced()
+        self.used_in_slots = ""
+        self.profisafe_support = bool(xml_submodule.getAttribute("PROFIsafeSupported"))
+
+        # subtrees of the lazy attributes, dropped when pickled
+        self._module_info = module_ref.getElementsByTagName("ModuleInfo")[0]
+        self._input_data_item = input_items[0] if input_items else None
+        self._output_data_item = output_items[0] if output_items else None
+        record_data_list = xml_submodule.getElementsByTagName("RecordDataList")
+        self._record_data_list = record_data_list[0] if record_data_list else None
+
+    def referenced(self, item_ref):
+        # the module as used by a DAP, with the slots of its ModuleItemRef
+        module = copy.copy(self)
+        module.allowed_in_slots = item_ref.getAttribute("AllowedInSlots")
+        module.used_in_slots = item_ref.getAttribute("UsedInSlots")
+        return module
+
+    def __getstate__(self):
+        for name in self.LAZY_ATTRIBUTES:
+            getattr(self, name)
+        state = self.__dict__.copy()
+        for name in (
+            "_module_info",
+            "_input_data_item",
+            "_output_data_item",
+            "_record_data_list",
+        ):
+            state.pop(name, None)
+        return state
+
+    @property
+    def _first_data_item(self):
+        # first DataItem of the input, of the output for output only modules
+        if self._input_data_item is None:
+            return self._output_data_item
+        return self._input_data_item
+
+    @cached_property
+    def name(self):
+        return (self._module_info.getElementsByTagName("Name")[0].getAttribute("TextId"),)
+
+    @cached_property
+    def order_number(self):
+        return (
+            self._module_info.getElementsByTagName("InfoText")[0].getAttribute(
+                "TextId"
             ),
         )
-        self.allowed_in_slots = item_ref.getAttribute("AllowedInSlots")
-        self.used_in_slots = item_ref.getAttribute("UsedInSlots")
-        self.profisafe_support = bool(xml_submodule.getAttribute("PROFIsafeSupported"))
-        self.parameters = self.calc_parameter_items(xml_submodule)
-        if self.profisafe_support:
-            self.f_parameters = self.calc_f_parameter_items(xml_submodule)
-
-    def calc_parameter_items(self, submodule):
-        record_data_list = submodule.getElementsByTagName("RecordDataList")
-        if len(record_data_list) > 0:
-            parameter_list = record_data_list[0].getElementsByTagName(
+
+    @cached_property
+    def input_id(self):
+        if self._input_data_item is None:
+            return ""
+        return self._input_data_item.getAttribute("TextId")
+
+    @cached_property
+    def output_id(self):
+        if self._output_data_item is None:
+            return ""
+        return self._output_data_item.getAttribute("TextId")
+
+    @cached_property
+    def datatype(self):
+        return (self._first_data_item.getAttribute("DataType"),)
+
+    @cached_property
+    def used_as_bits(self):
+        return (bool(self._first_data_item.getAttribute("UseAsBits")),)
+
+    @cached_property
+    def parameters(self):
+        return self.calc_parameter_items(self._record_data_list)
+
+    @cached_property
+    def f_parameters(self):
+        # None for modules without PROFIsafe support
+        if not self.profisafe_support:
+            return None
+        return self.calc_f_parameter_items(self._record_data_list)
+
+    def calc_parameter_items(self, record_data_list):
+        if record_data_list is not None:
+            parameter_list = record_data_list.getElementsByTagName(
                 "ParameterRecordDataItem"
             )
             return [XMLParameterRecordDataItem(element) for element in parameter_list]
         else:
             return []
 
-    def calc_f_parameter_items(self, submodule):
-        record_data_list = submodule.getElementsByTagName("RecordDataList")
-        if len(record_data_list) > 0:
-            f_parameter = record_data_list[0].getElementsByTagName(
+    def calc_f_parameter_items(self, record_data_list):
+        if record_data_list is not None:
+            f_parameter = record_data_list.getElementsByTagName(
                 "F_ParameterRecordDataItem"
             )[0]
             return XMLFParameterRecordDataItem(f_parameter)
@@ -320,7 +457,7 @@ class XMLFParameterRecordDataItem:
         self.index = int(parameter_element.getAttribute("Index"))
         self.paramDescCrc = int(parameter_element.getAttribute("F_ParamDescCRC"))
         for element in parameter_element.childNodes:
-            if element.nodeType == minidom.Node.ELEMENT_NODE:
+            if element.nodeType == Node.ELEMENT_NODE:
                 attr = {}
                 attr["name"] = element.nodeName
                 attr["default"] = element.getAttribute("DefaultValue")
@@ -329,6 +466,45 @@ class XMLFParameterRecordDataItem:
                 attr["visible"] = bool(element.getAttribute("Visible"))
                 self.attributes.append(attr)
 
+    def get_f_parameters(self, f_source_add, f_dest_add, **values):
+        """FParameters of one F-connection.
+
+        The addresses are assigned per connection, every other parameter
+        uses the GSDML default unless given as GSDML name and value, e.g.
+        F_WD_Time=150 or F_SIL="SIL3".
+        """
+        defaults = {attr["name"]: attr["default"] for attr in self.attributes}
+        defaults.update(values)
+
+        def coded(name, default):
+            # only missing or empty values fall back, 0 is a valid setting
+            value = defaults.get(name, "")
+            if value == "" or value is None:
+                value = default
+            codes = F_PARAMETER_CODES.get(name)
+            if codes is not None and isinstance(value, str) and value in codes:
+                return codes[value]
+            return int(value)
+
+        # F_WD_Time_2 and F_iPar_CRC are only present if the GSDML lists them
+        return FParameters(
+            f_source_add=f_source_add,
+            f_dest_add=f_dest_add,
+            f_wd_time=coded("F_WD_Time", 150),
+            f_check_seqnr=coded("F_Check_SeqNr", 0),
+            f_check_ipar=coded("F_Check_iPar", 0),
+            f_sil=coded("F_SIL", "SIL3"),
+            f_crc_length=coded("F_CRC_Length", "3-Byte-CRC"),
+            f_crc_seed=coded("F_CRC_Seed", "CRC-Seed16"),
+            f_passivation=coded("F_Passivation", "Device/Module"),
+            f_block_id=coded("F_Block_ID", 0),
+            f_par_version=coded("F_Par_Version", 1),
+            f_wd_time_2=(
+                coded("F_WD_Time_2", 0) if "F_WD_Time_2" in defaults else None
+            ),
+            f_ipar_crc=coded("F_iPar_CRC", 0) if "F_iPar_CRC" in defaults else None,
+        )
+
 
 class XMLInterfaceSubmoduleItem:
     def __init__(self, submodule_element):
@@ -395,20 +571,121 @@ class XMLDeviceAccessPointItem:
         self.module_ident_number = module_ident_number
 
 
+FrameLayoutEntry = namedtuple(
+    "FrameLayoutEntry", ["offset", "length", "slot", "subslot", "kind"]
+)
+
+
+class FrameLayout:
+    """Offsets of the cyclic data of a device access point.
+
+    Built once per device so decoding a frame only walks precomputed
+    offsets instead of the usable module list.
+    """
+
+    DATA = "data"
+    IOPS = "iops"
+    IOCS = "iocs"
+
+    def __init__(self, dap):
+        entries = []
+        offset = 0
+
+        # IOPS of the DAP submodule, the interface and the port
+        for subslot in (0x1, 0x8000, 0x8001):
+            entries.append(FrameLayoutEntry(offset, 1, 0x1, subslot, self.IOPS))
+            offset += 1
+
+        used_modules = [
+            module for module in dap.usable_modules if module.used_in_slots != ""
+        ]
+        for module in used_modules:
+            if module.output_length != 0:
+                entries.append(
+                    FrameLayoutEntry(
+                        offset,
+                        module.output_length,
+                        module.module_ident_number,
+                        module.submodule_ident_number,
+                        self.DATA,
+                    )
+                )
+                offset += module.output_length
+                entries.append(
+                    FrameLayoutEntry(
+                        offset,
+                        1,
+                        module.module_ident_number,
+                        module.submodule_ident_number,
+                        self.IOPS,
+                    )
+                )
+                offset += 1
+        for module in used_modules:
+            if module.input_length != 0:
+                entries.append(
+                    FrameLayoutEntry(
+                        offset,
+                        1,
+                        module.module_ident_number,
+                        module.submodule_ident_number,
+                        self.IOCS,
+                    )
+                )
+                offset += 1
+
+        self.entries = tuple(entries)
+        self.length = offset
+
+        # per kind views used when decoding frames
+        self.data = tuple(
+            (entry.offset, entry.offset + entry.length)
+            for entry in entries
+            if entry.kind == self.DATA
+        )
+        self.iops = tuple(
+            (entry.offset, entry.slot, entry.subslot)
+            for entry in entries
+            if entry.kind == self.IOPS
+        )
+        self.iocs = tuple(
+            (entry.offset, entry.slot, entry.subslot)
+            for entry in entries
+            if entry.kind == self.IOCS
+        )
+        self.iops_offsets = tuple(offset for offset, _, _ in self.iops)
+        self.iocs_offsets = tuple(offset for offset, _, _ in self.iocs)
+
+
 class XMLDevice:
     def __init__(self, path):
-        self.document = parse(path)
+        # DAPs and modules are taken over by the body while parsing
+        self.body = XMLProfileBody()
+        document = parse_gsdml(path, self.body.handlers())
 
         # PROCESS HEADER
-        xml_header = self.document.getElementsByTagName("ProfileHeader")[0]
+        xml_header = document.getElementsByTagName("ProfileHeader")[0]
         self.header = XMLProfileHeader(xml_header)
         # END PROCESS HEADER
 
         # START PROCESS BODY
-        xml_body = self.document.getElementsByTagName("ProfileBody")[0]
-        self.body = XMLProfileBody(xml_body)
+        xml_body = document.getElementsByTagName("ProfileBody")[0]
+        self.body.finish(xml_body)
         # END PROCESS BODY
 
+        self.frame_layout = FrameLayout(self.body.dap_list[0])
+        # only the subtrees of lazy module attributes stay referenced, the
+        # rest of the tree is freed with the document, as in cached devices
+        self.document = None
+
+    @property
+    def f_parameter_record(self):
+        # F_ParameterRecordDataItem of the PROFIsafe module, None if the
+        # device has none
+        for module in self.body.dap_list[0].usable_modules:
+            if module.profisafe_support and module.f_parameters:
+                return module.f_parameters
+
 
 def main():
     device = XMLDevice("./gsdml/test_project.xml")
@@ -0,0 +1,207 @@
+from time import perf_counter_ns
+
+from context import ProfiSafeHostContext
+from messages.profisafe_crc import CRC2State
+
+# phases of one host cycle recorded by CycleMetrics
+PHASES = ("decode", "status", "crc", "pdu_build", "cycle", "timeout")
+PERCENTILES = (50.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of nanosecond values, as HDR histograms use.
+
+    Values below 2**precision_bits are counted exactly, above that every
+    power of two is split into 2**(precision_bits - 1) buckets, so the
+    relative error stays below 2**(1 - precision_bits) (< 1.6% for the
+    default) at a fixed memory size. Recording is a bit_length and a list
+    increment, nothing is allocated.
+    """
+
+    def __init__(self, precision_bits=7, max_value=1 << 40):
+        self.precision_bits = precision_bits
+        self.half = 1 << (precision_bits - 1)
+        self.max_value = max_value
+        self.counts = [0] * (self.index(max_value) + 1)
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def index(self, value):
+        exponent = value.bit_length() - self.precision_bits
+        if exponent <= 0:
+            return value
+        return (exponent << (self.precision_bits - 1)) + (value >> exponent)
+
+    def bucket_range(self, index):
+        # lowest and highest value counted in a bucket
+        if index < 2 * self.half:
+            return index, index
+        exponent = (index >> (self.precision_bits - 1)) - 1
+        low = (index - (exponent << (self.precision_bits - 1))) << exponent
+        return low, low + (1 << exponent) - 1
+
+    def record(self, value):
+        if value > self.max_value:
+            value = self.max_value
+        elif value < 0:
+            value = 0
+        exponent = value.bit_length() - self.precision_bits
+        if exponent <= 0:
+            self.counts[value] += 1
+        else:
+            shift = self.precision_bits - 1
+            self.counts[(exponent << shift) + (value >> exponent)] += 1
+        self.total += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def percentile(self, percent):
+        # highest value of the bucket holding the percentile, like HDR
+        if not self.total:
+            return None
+        rank = max(1, -(-self.total * percent // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_range(index)[1], self.max)
+        return self.max
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def summary(self, percentiles=PERCENTILES):
+        result = {"count": self.total, "min": self.min}
+        result["mean"] = self.sum / self.total if self.total else None
+        for percent in percentiles:
+            result[f"p{percent:g}"] = self.percentile(percent)
+        result["max"] = self.max if self.total else None
+        return result
+
+
+class CycleMetrics:
+    """Per-connection latency histograms of the host cycle phases.
+
+    decode      raw frame to F-PDU (recorded by the runtime)
+    status      extraction of the Status Byte by the states
+    crc         CRC2 check of the received F-PDU
+    pdu_build   control byte and CRC2 of the answer PDU
+    cycle       state machine run of updateData(), including status, crc
+                and pdu_build
+    timeout     watchdog timeout handling
+    transitions state changes per cycle (a count, not ns)
+    """
+
+    __slots__ = PHASES + ("transitions",)
+
+    def __init__(self, precision_bits=7):
+        for phase in PHASES:
+            setattr(self, phase, LatencyHistogram(precision_bits))
+        self.transitions = LatencyHistogram(precision_bits, max_value=1 << 16)
+
+    def histograms(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def merge(self, other):
+        for name, histogram in self.histograms().items():
+            histogram.merge(getattr(other, name))
+
+    def reset(self):
+        for histogram in self.histograms().values():
+            histogram.reset()
+
+    def export(self, percentiles=PERCENTILES):
+        return {
+            name: histogram.summary(percentiles)
+            for name, histogram in self.histograms().items()
+        }
+
+
+class TimedCRC2State(CRC2State):
+    # CRC2State recording the duration of every check
+    def __init__(self, seed, crc_length, histogram):
+        super().__init__(seed, crc_length)
+        self.histogram = histogram
+
+    def check(self, vcn, pdu):
+        start = perf_counter_ns()
+        result = CRC2State.check(self, vcn, pdu)
+        self.histogram.record(perf_counter_ns() - start)
+        return result
+
+
+class InstrumentedHostContext(ProfiSafeHostContext):
+    """ProfiSafeHostContext recording cycle latencies into CycleMetrics.
+
+    The instrumentation lives in this subclass and in TimedCRC2State only,
+    so plain ProfiSafeHostContext instances run exactly the same code as
+    without it. Re-entrant updateData() and timeout() calls (a state
+    handing on to its successor) count towards the outermost call.
+    """
+
+    __slots__ = ("metrics", "depth", "cycle_transitions")
+
+    def __init__(self, *args, metrics: CycleMetrics = None, **kwargs) -> None:
+        self.metrics = CycleMetrics() if metrics is None else metrics
+        self.depth = 0
+        self.cycle_transitions = 0
+        super().__init__(*args, **kwargs)
+        self.crc_state = TimedCRC2State(self.crc1, self.crcLength, self.metrics.crc)
+
+    def setState(self, state):
+        self.cycle_transitions += 1
+        ProfiSafeHostContext.setState(self, state)
+
+    def extractStatus(self, statusByte):
+        start = perf_counter_ns()
+        status = ProfiSafeHostContext.extractStatus(statusByte)
+        self.metrics.status.record(perf_counter_ns() - start)
+        return status
+
+    def updateData(self, data) -> None:
+        if self.depth:
+            return ProfiSafeHostContext.updateData(self, data)
+        metrics = self.metrics
+        self.cycle_transitions = 0
+        self.depth = 1
+        start = perf_counter_ns()
+        try:
+            ProfiSafeHostContext.updateData(self, data)
+        finally:
+            self.depth = 0
+        metrics.cycle.record(perf_counter_ns() - start)
+        metrics.transitions.record(self.cycle_transitions)
+
+    def timeout(self) -> None:
+        if self.depth:
+            return ProfiSafeHostContext.timeout(self)
+        start = perf_counter_ns()
+        self.depth = 1
+        try:
+            ProfiSafeHostContext.timeout(self)
+        finally:
+            self.depth = 0
+        self.metrics.timeout.record(perf_counter_ns() - start)
+
+    def prepareMessage(self, data):
+        start = perf_counter_ns()
+        ProfiSafeHostContext.prepareMessage(self, data)
+        self.metrics.pdu_build.record(perf_counter_ns() - start)
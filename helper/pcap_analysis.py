@@ -0,0 +1,310 @@
+import mmap
+import sys
+
+import numpy as np
+
+from helper.pcap_reader import iter_mapped_records
+from messages.pnio_rt import ETHERTYPE_PROFINET, ETHERTYPE_VLAN, MIN_FRAME_LENGTH
+
+# rows gathered per fancy-indexing operation by cyclic_frames(), bounds its
+# int64 index matrix to GATHER_ROWS * frame length * 8 bytes
+GATHER_ROWS = 4096
+
+# Status Byte bits (see messages.profisafe_codec.StatusByte)
+STATUS_BITS = {
+    "cons_nr_R": 0x40,
+    "Toggle_d": 0x20,
+    "FV_activated": 0x10,
+    "WD_timeout": 0x08,
+    "CE_CRC": 0x04,
+    "Device_Fault": 0x02,
+    "iPar_OK": 0x01,
+}
+
+# Data status bits of the APDU status (see PNIOPSMessage.data_status)
+DATA_STATUS_BITS = {
+    "ignore": 0x80,
+    "station_problem_indicator": 0x20,
+    "provider_state": 0x10,
+    "data_valid": 0x04,
+    "state": 0x01,
+}
+
+class Capture:
+    """All frames of one capture: the mapped file contents and, per record,
+    the offset and length of the frame and its capture time in ns.
+
+    close() unmaps the file, also on leaving a with block. The rows of
+    cyclic_frames() can be views of the mapped file and have to be dropped
+    before, otherwise close() raises BufferError.
+    """
+
+    __slots__ = ("buffer", "offsets", "lengths", "timestamps", "_mapped")
+
+    def __init__(self, mapped, offsets, lengths, timestamps):
+        self._mapped = mapped
+        self.buffer = np.frombuffer(mapped, dtype=np.uint8)
+        self.offsets = offsets
+        self.lengths = lengths
+        self.timestamps = timestamps
+
+    def close(self):
+        self.buffer = None
+        try:
+            self._mapped.close()
+        except BufferError:
+            # still viewed, the capture stays usable
+            self.buffer = np.frombuffer(self._mapped, dtype=np.uint8)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _index_records(mapped):
+    # offsets, lengths and timestamps of the records, the record views of
+    # the mapped file are released on return
+    offsets = []
+    lengths = []
+    timestamps = []
+    with memoryview(mapped) as view:
+        for record in iter_mapped_records(view):
+            offsets.append(record.offset)
+            lengths.append(len(record.frame))
+            timestamps.append(record.timestamp or 0)
+    return offsets, lengths, timestamps
+
+
+def load_capture(path):
+    """Maps a pcap or pcapng file and indexes its ethernet records.
+
+    The records are walked by helper.pcap_reader, the frames stay in the
+    mapped file and are gathered into arrays by cyclic_frames(). Records
+    without a timestamp (pcapng simple packet blocks) get timestamp 0.
+    """
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        offsets, lengths, timestamps = _index_records(mapped)
+    except BaseException:
+        mapped.close()
+        raise
+
+    return Capture(
+        mapped,
+        offsets=np.array(offsets, dtype=np.int64),
+        lengths=np.array(lengths, dtype=np.int64),
+        timestamps=np.array(timestamps, dtype=np.int64),
+    )
+
+
+def _be16(buffer, positions):
+    return (buffer[positions].astype(np.uint16) << 8) | buffer[positions + 1]
+
+
+def frame_headers(capture):
+    """FrameID and offset of the cyclic data for every record.
+
+    Vectorized version of messages.pnio_rt.parse_frame_header, records that
+    are no PROFINET RT frame get FrameID -1.
+    """
+    buffer, offsets, lengths = capture.buffer, capture.offsets, capture.lengths
+    frame_ids = np.full(len(offsets), -1, dtype=np.int32)
+    data_offsets = np.zeros(len(offsets), dtype=np.int64)
+
+    long_enough = lengths >= MIN_FRAME_LENGTH
+    type_offset = offsets[long_enough] + 12
+    ether_type = _be16(buffer, type_offset)
+    vlan = ether_type == ETHERTYPE_VLAN
+    type_offset[vlan] += 4
+    ether_type[vlan] = _be16(buffer, type_offset[vlan])
+    profinet = (ether_type == ETHERTYPE_PROFINET) & (
+        lengths[long_enough] >= MIN_FRAME_LENGTH + 4 * vlan
+    )
+
+    indices = np.flatnonzero(long_enough)[profinet]
+    frame_ids[indices] = _be16(buffer, type_offset[profinet] + 2)
+    data_offsets[indices] = type_offset[profinet] + 4 - offsets[indices]
+    return frame_ids, data_offsets
+
+
+def cyclic_frames(capture, frame_id=None):
+    """2-D array of the cyclic frames of one IOCR, one row per frame.
+
+    Cyclic frames of an IOCR all have the same length. If they also follow
+    each other at a constant distance in the file, the rows are a strided
+    read-only view of the mapped file, otherwise they are gathered into a
+    new array GATHER_ROWS at a time. Without a frame_id the most frequent
+    cyclic FrameID of the capture is used.
+    Returns (frame_id, rows, data_offset, timestamps).
+    """
+    frame_ids, data_offsets = frame_headers(capture)
+    cyclic = ((frame_ids >= 0x0100) & (frame_ids < 0x1000)) | (
+        (frame_ids >= 0x8000) & (frame_ids < 0xFC00)
+    )
+    if frame_id is None:
+        if not cyclic.any():
+            raise ValueError("capture holds no cyclic frames")
+        frame_id = int(np.bincount(frame_ids[cyclic]).argmax())
+    selected = np.flatnonzero(cyclic & (frame_ids == frame_id))
+    if len(selected) == 0:
+        raise ValueError(f"no frames with FrameID {frame_id:#06x}")
+
+    lengths = capture.lengths[selected]
+    length = int(np.bincount(lengths).argmax())
+    selected = selected[lengths == length]
+    data_offset = int(data_offsets[selected[0]])
+    selected = selected[data_offsets[selected] == data_offset]
+
+    offsets = capture.offsets[selected]
+    strides = np.diff(offsets)
+    if len(strides) and (strides == strides[0]).all():
+        rows = np.lib.stride_tricks.as_strided(
+            capture.buffer[offsets[0] :],
+            shape=(len(offsets), length),
+            strides=(int(strides[0]), 1),
+            writeable=False,
+        )
+    else:
+        rows = np.empty((len(offsets), length), dtype=np.uint8)
+        columns = np.arange(length)
+        for start in range(0, len(offsets), GATHER_ROWS):
+            chunk = offsets[start : start + GATHER_ROWS]
+            rows[start : start + len(chunk)] = capture.buffer[chunk[:, None] + columns]
+    return frame_id, rows, data_offset, capture.timestamps[selected]
+
+
+def f_pdu_lengths(device, data_index=0):
+    """(data length, CRC length) of the F-PDU data_index of device.
+
+    The CRC length follows the F_CRC_Length default of the GSDML
+    F-Parameters (3 bytes without any), the data length the size of the
+    F-PDU in the compiled frame layout.
+    """
+    crc_length = 3
+    record = device.f_parameter_record
+    if record is not None:
+        # the addresses do not matter for the CRC length
+        if record.get_f_parameters(0, 0).f_crc_length == 2:
+            crc_length = 4
+    start, end = device.frame_layout.data[data_index]
+    data_length = end - start - 1 - crc_length
+    if data_length <= 0:
+        raise ValueError(
+            f"F-PDU of {end - start} bytes is too short for CRC length {crc_length}"
+        )
+    return data_length, crc_length
+
+
+def analyze(rows, data_offset, device, data_index=0, data_length=8, crc_length=3):
+    """Vectorized statistics over all cyclic frames of one IOCR.
+
+    rows come from cyclic_frames(), the F-PDU is data_index of the compiled
+    frame layout of device. Returns a dict of plain Python values.
+    """
+    count = len(rows)
+
+    # APDU status: cycle counter, data status, transfer status
+    cycle_counter = (rows[:, -4].astype(np.uint16) << 8) | rows[:, -3]
+    data_status = rows[:, -2]
+    transfer_status = rows[:, -1]
+
+    # cycle counter advances by the send clock factor, anything else is a
+    # lost or repeated frame
+    steps = np.diff(cycle_counter).astype(np.uint16)
+    step_values, step_counts = np.unique(steps, return_counts=True)
+    nominal_step = int(step_values[step_counts.argmax()]) if len(steps) else 0
+    gaps = np.flatnonzero(steps != nominal_step)
+
+    status_values, status_counts = np.unique(data_status, return_counts=True)
+
+    # status byte of the F-PDU
+    start, end = device.frame_layout.data[data_index]
+    if end - start != data_length + 1 + crc_length:
+        raise ValueError(
+            f"F-PDU of {end - start} bytes does not match data length "
+            f"{data_length} and CRC length {crc_length}"
+        )
+    status_byte = rows[:, data_offset + start + data_length]
+
+    # the F-Device flips Toggle_d once per acknowledged host PDU, so it
+    # stays the same for a few cycles and then changes
+    toggle = (status_byte & STATUS_BITS["Toggle_d"]) != 0
+    flips = np.flatnonzero(toggle[1:] != toggle[:-1]) + 1
+    runs = np.diff(flips)
+
+    fault_bits = {}
+    for name in ("WD_timeout", "CE_CRC", "Device_Fault", "FV_activated"):
+        set_rows = np.flatnonzero(status_byte & STATUS_BITS[name])
+        fault_bits[name] = {
+            "frames": len(set_rows),
+            "first": int(set_rows[0]) if len(set_rows) else None,
+        }
+
+    return {
+        "frames": count,
+        "cycle_counter": {
+            "nominal_step": nominal_step,
+            "steps": dict(zip(step_values.tolist(), step_counts.tolist())),
+            "gaps": len(gaps),
+            "first_gaps": gaps[:10].tolist(),
+        },
+        "data_status": {
+            "values": {
+                f"{value:#04x}": count
+                for value, count in zip(status_values.tolist(), status_counts.tolist())
+            },
+            "bits": {
+                name: int(np.count_nonzero(data_status & mask))
+                for name, mask in DATA_STATUS_BITS.items()
+            },
+        },
+        "transfer_status_errors": int(np.count_nonzero(transfer_status)),
+        "toggle": {
+            "flips": len(flips),
+            "min_run": int(runs.min()) if len(runs) else None,
+            "max_run": int(runs.max()) if len(runs) else None,
+            "mean_run": float(runs.mean()) if len(runs) else None,
+        },
+        "status_bits": fault_bits,
+    }
+
+
+def cycle_times(timestamps):
+    # capture time between consecutive frames in µs
+    if len(timestamps) < 2:
+        return None
+    intervals = np.diff(timestamps) / 1000
+    return {
+        "min": float(intervals.min()),
+        "mean": float(intervals.mean()),
+        "max": float(intervals.max()),
+    }
+
+
+def main():
+    from pprint import pprint
+
+    from helper.gsdml_cache import load_device
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "./sniff/only_status_msgs.pcap"
+    gsdml = sys.argv[2] if len(sys.argv) > 2 else "./gsdml/test_project.xml"
+
+    device = load_device(gsdml)
+    data_length, crc_length = f_pdu_lengths(device)
+    with load_capture(path) as capture:
+        frame_id, rows, data_offset, timestamps = cyclic_frames(capture)
+        print(f"FrameID {frame_id:#06x}: {len(rows)} of {len(capture.offsets)} frames")
+        stats = analyze(rows, data_offset, device, 0, data_length, crc_length)
+        stats["cycle_times_us"] = cycle_times(timestamps)
+        # rows can be a view of the mapped file
+        del rows
+    pprint(stats, sort_dicts=False)
+
+
+if __name__ == "__main__":
+    main()
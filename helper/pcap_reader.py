@@ -0,0 +1,207 @@
+import mmap
+import struct
+from collections import namedtuple
+
+from messages.pnio_rt import parse_frame_header
+
+LINKTYPE_ETHERNET = 1
+
+# pcap magic -> (byte order, ns per timestamp fraction)
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1000),
+    b"\xa1\xb2\xc3\xd4": (">", 1000),
+    b"\x4d\x3c\xb2\xa1": ("<", 1),
+    b"\xa1\xb2\x3c\x4d": (">", 1),
+}
+PCAPNG_SECTION_HEADER = b"\x0a\x0d\x0d\x0a"
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+# pcapng block types
+BLOCK_INTERFACE = 0x00000001
+BLOCK_PACKET = 0x00000002  # obsolete, still written by old tools
+BLOCK_SIMPLE_PACKET = 0x00000003
+BLOCK_ENHANCED_PACKET = 0x00000006
+OPTION_IF_TSRESOL = 9
+
+# frame is a view into the capture, timestamp in ns (None if the record
+# has no timestamp), offset is the position of the frame in the file
+CaptureRecord = namedtuple("CaptureRecord", ["timestamp", "frame", "offset"])
+
+
+class _MappedSource:
+    # reads return views into the mapped file, nothing is copied
+    def __init__(self, view):
+        self.view = view
+        self.position = 0
+
+    def read(self, size):
+        start = self.position
+        self.position = start + size
+        return self.view[start : self.position]
+
+    def tell(self):
+        return self.position
+
+
+def _pcap_records(source, header):
+    byte_order, resolution = PCAP_MAGIC[bytes(header[:4])]
+    if struct.unpack_from(byte_order + "I", header, 20)[0] != LINKTYPE_ETHERNET:
+        return
+    record = struct.Struct(byte_order + "IIII")
+    while True:
+        record_header = source.read(record.size)
+        if len(record_header) < record.size:
+            return
+        ts_sec, ts_frac, incl_len, _ = record.unpack(record_header)
+        offset = source.tell()
+        frame = source.read(incl_len)
+        if len(frame) < incl_len:
+            return  # truncated last record
+        yield CaptureRecord(
+            ts_sec * 1_000_000_000 + ts_frac * resolution, frame, offset
+        )
+
+
+def _tsresol(options, byte_order):
+    # timestamp units per second of an interface, default is microseconds
+    position = 0
+    while position + 4 <= len(options):
+        code, length = struct.unpack_from(byte_order + "HH", options, position)
+        if code == 0:
+            break
+        if code == OPTION_IF_TSRESOL and length >= 1:
+            value = options[position + 4]
+            if value & 0x80:
+                return 1 << (value & 0x7F)
+            return 10**value
+        position += 4 + (length + 3) // 4 * 4
+    return 1_000_000
+
+
+def _pcapng_records(source, first_block):
+    byte_order = "<"
+    interfaces = []  # (linktype, snaplen, timestamp units per second)
+    block_header = first_block
+    while len(block_header) == 8:
+        block_type = bytes(block_header[:4])
+        if block_type == PCAPNG_SECTION_HEADER:
+            # every section may use its own byte order
+            magic = source.read(4)
+            if len(magic) < 4:
+                return
+            byte_order = (
+                "<"
+                if struct.unpack("<I", magic)[0] == PCAPNG_BYTE_ORDER_MAGIC
+                else ">"
+            )
+            length = struct.unpack_from(byte_order + "I", block_header, 4)[0]
+            body = source.read(length - 12)
+            interfaces = []
+            block_header = source.read(8)
+            continue
+
+        block_type, length = struct.unpack(byte_order + "II", block_header)
+        if length < 12:
+            return
+        offset = source.tell()
+        body = source.read(length - 8)
+        if len(body) < length - 8:
+            return  # truncated last block
+
+        if block_type == BLOCK_INTERFACE:
+            linktype, _, snaplen = struct.unpack_from(byte_order + "HHI", body)
+            interfaces.append((linktype, snaplen, _tsresol(body[8:-4], byte_order)))
+        elif block_type == BLOCK_ENHANCED_PACKET:
+            interface, ts_high, ts_low, caplen, _ = struct.unpack_from(
+                byte_order + "IIIII", body
+            )
+            linktype, _, resolution = interfaces[interface]
+            if linktype == LINKTYPE_ETHERNET:
+                yield CaptureRecord(
+                    ((ts_high << 32) | ts_low) * 1_000_000_000 // resolution,
+                    body[20 : 20 + caplen],
+                    offset + 20,
+                )
+        elif block_type == BLOCK_PACKET:
+            interface, _, ts_high, ts_low, caplen, _ = struct.unpack_from(
+                byte_order + "HHIIII", body
+            )
+            linktype, _, resolution = interfaces[interface]
+            if linktype == LINKTYPE_ETHERNET:
+                yield CaptureRecord(
+                    ((ts_high << 32) | ts_low) * 1_000_000_000 // resolution,
+                    body[20 : 20 + caplen],
+                    offset + 20,
+                )
+        elif block_type == BLOCK_SIMPLE_PACKET and interfaces:
+            linktype, snaplen, _ = interfaces[0]
+            original_length = struct.unpack_from(byte_order + "I", body)[0]
+            caplen = min(original_length, snaplen) if snaplen else original_length
+            if linktype == LINKTYPE_ETHERNET:
+                yield CaptureRecord(None, body[4 : 4 + caplen], offset + 4)
+        block_header = source.read(8)
+
+
+def _records(source):
+    start = source.read(8)
+    if len(start) < 8:
+        return
+    if bytes(start[:4]) == PCAPNG_SECTION_HEADER:
+        yield from _pcapng_records(source, start)
+    elif bytes(start[:4]) in PCAP_MAGIC:
+        header = bytes(start) + bytes(source.read(16))
+        yield from _pcap_records(source, header)
+    else:
+        raise ValueError("not a pcap or pcapng capture")
+
+
+def iter_mapped_records(view):
+    """Yields a CaptureRecord for every ethernet frame of a capture held in
+    memory, e.g. a memoryview of a mapped file. Frames are views into it."""
+    return _records(_MappedSource(view))
+
+
+def iter_records(path):
+    """Yields a CaptureRecord for every ethernet frame of a pcap or pcapng
+    file.
+
+    The file is memory mapped and frames are views into the mapping, so
+    memory use does not grow with the capture size. Copy a frame with
+    bytes() to keep it after the capture has been read.
+    Files that cannot be mapped are read record by record instead.
+    """
+    with open(path, "rb") as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # empty file or no mmap support, frames are copied then
+            yield from _records(file)
+            return
+
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mapped)
+        try:
+            yield from iter_mapped_records(view)
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # a frame is still in use, the mapping goes with it
+
+
+def iter_frames(path, frame_ids=None):
+    """Yields the cyclic PROFINET RT frames (EtherType 0x8892) of a capture.
+
+    frame_ids is a (first, last) range of FrameIDs to keep, by default every
+    cyclic FrameID. Frames are filtered on the raw header before any
+    dissection, see iter_records() for how long a frame stays valid.
+    """
+    for record in iter_records(path):
+        header = parse_frame_header(record.frame)
+        if header is None:
+            continue
+        if frame_ids is not None and not frame_ids[0] <= header[0] <= frame_ids[1]:
+            continue
+        yield record.frame
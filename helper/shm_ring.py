@@ -0,0 +1,158 @@
+import struct
+from multiprocessing import shared_memory
+
+# head and tail counters live on separate cache lines, as indices of the
+# header viewed as 64-bit counters
+HEAD = 0
+TAIL = 8
+HEADER_SIZE = 128
+
+LENGTH = struct.Struct("=I")
+
+
+class ShmRing:
+    """Single-producer/single-consumer ring buffer in shared memory.
+
+    The ring holds `slots` fixed-size slots of `slot_size` bytes, each
+    prefixed by the length of its entry. The producer only writes the head
+    counter and the consumer only writes the tail counter, so no lock is
+    needed between the two processes. Counters only grow; the slot is the
+    counter modulo the (power of two) slot count.
+
+    The counters are accessed through a memoryview cast to "Q", which loads
+    and stores them as one aligned 64-bit word. struct.pack_into() clears
+    its target before writing, so the other process could read a counter
+    as 0 in between.
+    """
+
+    def __init__(self, shm, slots, slot_size, owner):
+        self.shm = shm
+        self.buf = shm.buf
+        self.counters = shm.buf[:HEADER_SIZE].cast("Q")
+        self.slots = slots
+        self.slot_size = slot_size
+        self.stride = LENGTH.size + slot_size
+        self.mask = slots - 1
+        self.owner = owner
+
+    @classmethod
+    def create(cls, slots=1024, slot_size=256, name=None):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        size = HEADER_SIZE + slots * (LENGTH.size + slot_size)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        return cls(shm, slots, slot_size, owner=True)
+
+    @classmethod
+    def attach(cls, name, slots, slot_size):
+        # worker processes share the resource tracker of their parent, so
+        # the segment stays registered once and is unlinked by its creator
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, slots, slot_size, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        # arguments for attach() in another process
+        return (self.shm.name, self.slots, self.slot_size)
+
+    def __len__(self):
+        return self.counters[HEAD] - self.counters[TAIL]
+
+    def _slot_offset(self, counter):
+        return HEADER_SIZE + (counter & self.mask) * self.stride
+
+    # producer side
+
+    def reserve(self):
+        # view of the next free slot, None if the ring is full
+        counters = self.counters
+        head = counters[HEAD]
+        if head - counters[TAIL] >= self.slots:
+            return None
+        start = self._slot_offset(head) + LENGTH.size
+        return self.buf[start : start + self.slot_size]
+
+    def commit(self, length):
+        # publish the slot returned by reserve() holding `length` bytes
+        head = self.counters[HEAD]
+        LENGTH.pack_into(self.buf, self._slot_offset(head), length)
+        self.counters[HEAD] = head + 1
+
+    def push(self, data):
+        length = len(data)
+        if length > self.slot_size:
+            raise ValueError(f"entry of {length} bytes exceeds slot size")
+        slot = self.reserve()
+        if slot is None:
+            return False
+        slot[:length] = data
+        slot.release()
+        self.commit(length)
+        return True
+
+    # consumer side
+
+    def peek(self):
+        # view of the oldest entry, None if the ring is empty
+        buf = self.buf
+        tail = self.counters[TAIL]
+        if tail == self.counters[HEAD]:
+            return None
+        offset = self._slot_offset(tail)
+        length = LENGTH.unpack_from(buf, offset)[0]
+        start = offset + LENGTH.size
+        return buf[start : start + length]
+
+    def release(self):
+        # hand the slot returned by peek() back to the producer
+        self.counters[TAIL] += 1
+
+    def pop(self):
+        entry = self.peek()
+        if entry is None:
+            return None
+        data = bytes(entry)
+        entry.release()
+        self.release()
+        return data
+
+    def close(self):
+        self.counters.release()
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class ProcessImageRing(ShmRing):
+    """ShmRing of fixed-size process images.
+
+    Every entry is exactly `image_size` bytes, e.g. one F-PDU (F-Data,
+    status/control byte and CRC2). Images are read and written in place:
+    the consumer works on the view returned by peek() and the producer
+    fills the view returned by reserve(), nothing is copied or pickled on
+    the way between the I/O process and the safety process.
+    """
+
+    @classmethod
+    def create(cls, image_size, slots=1024, name=None):
+        return super().create(slots=slots, slot_size=image_size, name=name)
+
+    @property
+    def image_size(self):
+        return self.slot_size
+
+    def publish(self):
+        # publish the image written to the slot returned by reserve()
+        self.commit(self.slot_size)
+
+    def push(self, image):
+        if len(image) != self.slot_size:
+            raise ValueError(
+                f"image of {len(image)} bytes, expected {self.slot_size} bytes"
+            )
+        return super().push(image)
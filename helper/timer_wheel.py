@@ -0,0 +1,106 @@
+import time
+
+
+class WatchdogTimer:
+    """Restartable one-shot timer owned by a TimerWheel."""
+
+    __slots__ = ("wheel", "interval_ns", "callback", "deadline", "bucket")
+
+    def __init__(self, wheel, interval_ns, callback):
+        self.wheel = wheel
+        self.interval_ns = interval_ns
+        self.callback = callback
+        self.deadline = 0
+        self.bucket = None  # bucket of the wheel while armed
+
+    @property
+    def armed(self):
+        return self.bucket is not None
+
+    def start(self, now=None):
+        if now is None:
+            now = time.monotonic_ns()
+        self.wheel.schedule(self, now + self.interval_ns)
+
+    # (re)arming is the same operation on a wheel
+    restart = start
+
+    def stop(self):
+        self.wheel.cancel(self)
+
+
+class TimerWheel:
+    """Hashed timer wheel for many watchdogs on one thread.
+
+    Arming, re-arming and stopping a timer are O(1) set operations.
+    advance() has to be called regularly (at least once per tick) and
+    fires every timer whose deadline has passed. Timers further away than
+    one rotation stay in their bucket until their deadline is reached.
+    """
+
+    def __init__(self, tick_ns=1_000_000, slots=1024):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick_ns = tick_ns
+        self.slots = slots
+        self.mask = slots - 1
+        self.buckets = [set() for _ in range(slots)]
+        self.current_tick = time.monotonic_ns() // tick_ns
+
+        # expiry jitter (time between deadline and firing)
+        self.expired = 0
+        self.jitter_total_ns = 0
+        self.jitter_max_ns = 0
+
+    def create_timer(self, interval_ms, callback):
+        return WatchdogTimer(self, interval_ms * 1_000_000, callback)
+
+    def schedule(self, timer, deadline):
+        if timer.bucket is not None:
+            timer.bucket.discard(timer)
+        # first tick at or after the deadline, never the one being processed
+        tick = max(-(-deadline // self.tick_ns), self.current_tick + 1)
+        bucket = self.buckets[tick & self.mask]
+        bucket.add(timer)
+        timer.bucket = bucket
+        timer.deadline = deadline
+
+    def cancel(self, timer):
+        if timer.bucket is not None:
+            timer.bucket.discard(timer)
+            timer.bucket = None
+
+    def advance(self, now=None):
+        if now is None:
+            now = time.monotonic_ns()
+        target = now // self.tick_ns
+        # after a stall every bucket is visited once
+        ticks = min(target - self.current_tick, self.slots)
+        start = self.current_tick + 1
+        self.current_tick = max(target, self.current_tick)
+
+        fired = 0
+        for tick in range(start, start + ticks):
+            bucket = self.buckets[tick & self.mask]
+            if not bucket:
+                continue
+            due = [timer for timer in bucket if timer.deadline <= now]
+            for timer in due:
+                bucket.discard(timer)
+                timer.bucket = None
+                jitter = now - timer.deadline
+                self.expired += 1
+                self.jitter_total_ns += jitter
+                if jitter > self.jitter_max_ns:
+                    self.jitter_max_ns = jitter
+                # the callback may re-arm the timer
+                timer.callback()
+            fired += len(due)
+        return fired
+
+    def jitter_stats(self):
+        return {
+            "expired": self.expired,
+            "mean_ns": self.jitter_total_ns / self.expired if self.expired else 0,
+            "max_ns": self.jitter_max_ns,
+        }
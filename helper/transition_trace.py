@@ -0,0 +1,127 @@
+import logging
+import time
+from array import array
+from collections import Counter, namedtuple
+
+logger = logging.getLogger("profisafe.transitions")
+
+TransitionRecord = namedtuple(
+    "TransitionRecord",
+    ["timestamp", "from_state", "to_state", "vcn", "toggle", "faults"],
+)
+
+
+def state_name(state):
+    return "None" if state is None else type(state).__name__
+
+
+class TransitionTrace:
+    """Ring buffer of the last state transitions of one context.
+
+    Records are kept in preallocated arrays so recording does not allocate.
+    Transitions are additionally logged at DEBUG level if that level is
+    enabled for the "profisafe.transitions" logger, at most log_limit per
+    log_interval_ns. The number of transitions left out is logged with the
+    first one of the next interval, summarize() covers all of them.
+    """
+
+    def __init__(self, capacity=1024, log_limit=10, log_interval_ns=1_000_000_000):
+        self.capacity = capacity
+        self.timestamps = array("q", bytes(8 * capacity))
+        self.from_states = [None] * capacity
+        self.to_states = [None] * capacity
+        self.vcns = array("q", bytes(8 * capacity))
+        self.toggles = bytearray(capacity)
+        self.faults = bytearray(capacity)
+        self.index = 0  # next slot to write
+        self.total = 0  # transitions recorded so far
+        self.summarized = 0  # value of total at the last summary
+
+        # DEBUG logging window: start, transitions logged and left out
+        self.log_limit = log_limit
+        self.log_interval_ns = log_interval_ns
+        self.log_window = 0
+        self.logged = 0
+        self.suppressed = 0
+
+    def record(self, from_state, to_state, vcn, toggle, faults):
+        index = self.index
+        now = time.monotonic_ns()
+        self.timestamps[index] = now
+        self.from_states[index] = from_state
+        self.to_states[index] = to_state
+        self.vcns[index] = vcn
+        self.toggles[index] = toggle
+        self.faults[index] = faults
+        self.index = index + 1 if index + 1 < self.capacity else 0
+        self.total += 1
+
+        if logger.isEnabledFor(logging.DEBUG):
+            self._log(now, from_state, to_state, vcn, toggle, faults)
+
+    def _log(self, now, from_state, to_state, vcn, toggle, faults):
+        if now - self.log_window >= self.log_interval_ns:
+            if self.suppressed:
+                logger.debug(
+                    "%d transitions not logged (limit %d per %d ms)",
+                    self.suppressed,
+                    self.log_limit,
+                    self.log_interval_ns // 1_000_000,
+                )
+            self.log_window = now
+            self.logged = 0
+            self.suppressed = 0
+        if self.logged >= self.log_limit:
+            self.suppressed += 1
+            return
+        self.logged += 1
+        logger.debug(
+            "%s -> %s (vcn=%d toggle=%d faults=%#x)",
+            state_name(from_state),
+            state_name(to_state),
+            vcn,
+            toggle,
+            faults,
+        )
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def _indices(self, count):
+        # buffer indices of the last `count` records, oldest first
+        count = min(count, len(self))
+        start = self.index - count
+        return [(start + offset) % self.capacity for offset in range(count)]
+
+    def history(self, count=None):
+        if count is None:
+            count = self.capacity
+        return [
+            TransitionRecord(
+                timestamp=self.timestamps[index],
+                from_state=state_name(self.from_states[index]),
+                to_state=state_name(self.to_states[index]),
+                vcn=self.vcns[index],
+                toggle=self.toggles[index],
+                faults=self.faults[index],
+            )
+            for index in self._indices(count)
+        ]
+
+    def summarize(self):
+        # transition counts per target state since the last summary; older
+        # records may already be overwritten if the interval was too long
+        count = self.total - self.summarized
+        counts = Counter(
+            state_name(self.to_states[index]) for index in self._indices(count)
+        )
+        if count > self.capacity:
+            counts["<overwritten>"] = count - self.capacity
+        self.summarized = self.total
+
+        logger.info(
+            "%d transitions: %s",
+            count,
+            ", ".join(f"{name}={n}" for name, n in counts.most_common()),
+        )
+        return counts
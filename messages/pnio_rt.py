@@ -0,0 +1,169 @@
+import struct
+from collections import namedtuple
+
+ETHERTYPE_PROFINET = 0x8892
+ETHERTYPE_VLAN = 0x8100
+
+# APDU status trailing every cyclic frame: cycle counter, data status and
+# transfer status
+APDU_STATUS = struct.Struct(">HBB")
+
+# Ethernet header (14) + FrameID (2) + APDU status (4)
+MIN_FRAME_LENGTH = 20
+
+
+# Decoded IOPS/IOCS octet. Records are shared between all frames, the
+# slot and subslot of an IOxS are taken from the device frame layout.
+IOxS = namedtuple("IOxS", ["data_state", "instance", "reserved", "extension"])
+
+
+def decode_ioxs_byte(state):
+    return IOxS(
+        data_state=bool(state & 0x80),  # 1: Good 0: Bad
+        instance=(state >> 5) & 0x3,  # should be zero 0: Detected by subslot
+        reserved=(state >> 1) & 0xF,  # should be zero
+        extension=bool(state & 0x1),  # 0: No IOxS octet follows 1: IOxS octet follows
+    )
+
+
+IOXS_TABLE = tuple(decode_ioxs_byte(state) for state in range(256))
+
+
+def decode_ioxs(payload, offsets):
+    # decode all IOxS octets at the given offsets of a frame
+    table = IOXS_TABLE
+    return [table[payload[offset]] for offset in offsets]
+
+
+def is_cyclic_frame_id(frame_id):
+    # RT_CLASS_3 and RT_CLASS_1/2/UDP cyclic frames (IEC 61158-6-10)
+    return 0x0100 <= frame_id < 0x1000 or 0x8000 <= frame_id < 0xFC00
+
+
+class PNIOPSMessage:
+    def __init__(self) -> None:
+        self.frame_id = 0
+        self.cycle_counter = 0
+        self.data_status = {
+            "ignore": False,  # 1: Ignore 0: Evaluate
+            "reserved_2": False,  # should be zero
+            "station_problem_indicator": False,  # 1: Ok, 0: Problem
+            "provider_state": False,  # 1: Run 0: Stop
+            "reserved_1": False,  # should be zero
+            "data_valid": False,  # 1: Valid, 0: Invalid
+            "redundancy": False,  # has no meaning for outputCRs
+            "state": False,  # 1: primary, 0. backup
+        }
+        self.input_data = {"iops": [], "iocs": [], "data": []}
+
+    def convert_number_to_state_array(self, flags):
+        self.data_status = {
+            "ignore": flags.ignore,  # 1: Ignore 0: Evaluate
+            "reserved_2": flags.reserved_2,  # should be zero
+            "station_problem_indicator": flags.no_problem,  # 1: Ok, 0: Problem
+            "provider_state": flags.run,  # 1: Run 0: Stop
+            "reserved_1": flags.reserved_1,  # should be zero
+            "data_valid": flags.validData,  # 1: Valid, 0: Invalid
+            "redundancy": flags.redundancy,  # has no meaning for outputCRs
+            "state": flags.primary,  # 1: primary, 0. backup
+        }
+
+    def convert_data_status(self, status):
+        # same as convert_number_to_state_array, but from the raw status byte
+        self.data_status = {
+            "ignore": bool(status & 0x80),
+            "reserved_2": bool(status & 0x40),
+            "station_problem_indicator": bool(status & 0x20),
+            "provider_state": bool(status & 0x10),
+            "reserved_1": bool(status & 0x08),
+            "data_valid": bool(status & 0x04),
+            "redundancy": bool(status & 0x02),
+            "state": bool(status & 0x01),
+        }
+
+    def parse_io_state(self, state, slot, subslot):
+        ioxs = IOXS_TABLE[state]
+        return {
+            "module": str(slot),
+            "submodule": str(subslot),
+            "data_state": ioxs.data_state,
+            "instance": ioxs.instance,
+            "reserved": ioxs.reserved,
+            "extension": ioxs.extension,
+        }
+
+    def parse_input_data(self, data, device):
+        layout = device.frame_layout
+
+        # slices of the view share the frame buffer instead of copying it
+        payload_bytes = memoryview(data)
+
+        # iops/iocs line up with layout.iops/layout.iocs
+        self.input_data = {
+            "iops": decode_ioxs(payload_bytes, layout.iops_offsets),
+            "iocs": decode_ioxs(payload_bytes, layout.iocs_offsets),
+            "data": [payload_bytes[start:end] for start, end in layout.data],
+        }
+
+
+# Scapy based dissection, slow but useful for debugging
+def parse_data_message(packet, device):
+    message = PNIOPSMessage()
+
+    if packet.haslayer("PROFINET IO Real Time Cyclic Default Raw Data"):
+        pkt_rt = packet.getlayer("PROFINET Real-Time")
+        pkt_raw_layer = packet.getlayer("PROFINET IO Real Time Cyclic Default Raw Data")
+        message.frame_id = packet.getlayer("ProfinetIO").frameID
+        message.convert_number_to_state_array(pkt_rt.dataStatus)
+        message.cycle_counter = pkt_rt.cycleCounter
+        message.parse_input_data(pkt_raw_layer.data, device)
+
+        return message
+
+    else:
+        return
+
+
+# Returns (frame_id, offset of the cyclic data) of a cyclic real-time
+# frame, None for any other frame
+def parse_frame_header(view):
+    frame_length = len(view)
+    if frame_length < MIN_FRAME_LENGTH:
+        return
+
+    offset = 12
+    ether_type = (view[offset] << 8) | view[offset + 1]
+    if ether_type == ETHERTYPE_VLAN:
+        offset += 4
+        if frame_length < MIN_FRAME_LENGTH + 4:
+            return
+        ether_type = (view[offset] << 8) | view[offset + 1]
+    if ether_type != ETHERTYPE_PROFINET:
+        return
+
+    frame_id = (view[offset + 2] << 8) | view[offset + 3]
+    if not is_cyclic_frame_id(frame_id):
+        return
+
+    return frame_id, offset + 4
+
+
+# Decodes a raw ethernet frame without Scapy. The cyclic data of the
+# returned message are views into the frame buffer, so the buffer must
+# not be reused while the message is in use.
+def parse_raw_data_message(frame, device):
+    view = memoryview(frame)
+    header = parse_frame_header(view)
+    if header is None:
+        return
+
+    frame_length = len(view)
+    message = PNIOPSMessage()
+    message.frame_id, offset = header
+    message.cycle_counter, data_status, _ = APDU_STATUS.unpack_from(
+        view, frame_length - APDU_STATUS.size
+    )
+    message.convert_data_status(data_status)
+    message.parse_input_data(view[offset : frame_length - APDU_STATUS.size], device)
+
+    return message
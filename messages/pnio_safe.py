@@ -3,43 +3,77 @@ from scapy.all import *
 from scapy.contrib.pnio_rpc import *
 from scapy.contrib.dce_rpc import *
 from scapy.contrib.pnio import *
-import crcmod
 
+from messages.profisafe_codec import encode_control_byte
+from messages.profisafe_crc import constant_payload_crc, get_crc2_engine, payload_crc
 
 load_contrib("pnio")
 load_contrib("pnio_rpc")
 load_contrib("dce_rpc")
-crc2_func = crcmod.mkCrcFun(0x15D6DCB, initCrc=0, xorOut=0x0, rev=False)
 
 
 def convert_controlbyte_to_dec(control_byte):
-    return int(
-        f'10{control_byte["Toggle_h"]}{control_byte["activate_FV"]}{control_byte["Use_TO2"]}{control_byte["R_cons_nr"]}{control_byte["OA_Req"]}{control_byte["iPar_EN"]}',
-        2,
+    return encode_control_byte(
+        toggle_h=control_byte["Toggle_h"],
+        activate_fv=control_byte["activate_FV"],
+        use_to2=control_byte["Use_TO2"],
+        r_cons_nr=control_byte["R_cons_nr"],
+        oa_req=control_byte["OA_Req"],
+        ipar_en=control_byte["iPar_EN"],
     )
 
 
-def get_profisafe_pdu(control_byte, data, seed, vcn, crc_length=3):
-    control_dec = convert_controlbyte_to_dec(control_byte)
-    pdu = data + [control_dec]
-    crc = crc2_func(
-        bytearray([0x00] + list((vcn + 1).to_bytes(crc_length, "big")) + list(pdu))[::-1],
-        crc=seed,
+# Writes the safety PDU (data, control byte, CRC2) into buffer at offset,
+# e.g. straight into an outgoing frame. control_byte is the encoded Control
+# Byte (see encode_control_byte), data a bytes-like object. constant marks
+# fail-safe and test-pattern payloads, whose CRC is cached (see
+# constant_payload_crc). Returns the number of bytes written.
+def write_profisafe_pdu(
+    buffer, offset, control_byte, data, seed, vcn, crc_length=3, constant=False
+):
+    if not isinstance(data, bytes):
+        data = bytes(data)
+    if constant:
+        crc = constant_payload_crc(seed, control_byte, data, crc_length)
+    else:
+        crc = payload_crc(seed, control_byte, data, crc_length)
+    crc ^= get_crc2_engine(crc_length).vcn_term(vcn + 1)
+
+    end = offset + len(data)
+    buffer[offset:end] = data
+    buffer[end] = control_byte
+    buffer[end + 1 : end + 1 + crc_length] = crc.to_bytes(crc_length, "big")
+    return end + 1 + crc_length - offset
+
+
+# Scapy view of a raw safety PDU, for debugging only
+def profisafe_pdu_view(pdu, crc_length=3):
+    split = len(pdu) - crc_length - 1
+    return PROFIsafeControl(
+        data=list(pdu[:split]),
+        control=pdu[split],
+        crc=int.from_bytes(pdu[split + 1 :], "big"),
     )
 
-    return PROFIsafeControl(data=data, control=control_dec, crc=crc)
+
+def get_profisafe_pdu(control_byte, data, seed, vcn, crc_length=3):
+    pdu = bytearray(len(data) + 1 + crc_length)
+    write_profisafe_pdu(pdu, 0, control_byte, bytes(data), seed, vcn, crc_length)
+    return profisafe_pdu_view(pdu, crc_length)
 
 
 def main():
     get_profisafe_pdu(
-        control_byte={
-            "Toggle_h": 1,
-            "activate_FV": 1,
-            "Use_TO2": 0,
-            "R_cons_nr": 0,
-            "OA_Req": 0,
-            "iPar_EN": 0,
-        },
+        control_byte=convert_controlbyte_to_dec(
+            {
+                "Toggle_h": 1,
+                "activate_FV": 1,
+                "Use_TO2": 0,
+                "R_cons_nr": 0,
+                "OA_Req": 0,
+                "iPar_EN": 0,
+            }
+        ),
         data=[0, 0, 0, 0, 0, 0, 0, 0],
         seed=0x22FF,
         vcn=1,
@@ -0,0 +1,74 @@
+from collections import namedtuple
+
+# Status Byte (F-Device -> host), bit 7 first
+StatusByte = namedtuple(
+    "StatusByte",
+    [
+        "Bit7",
+        "cons_nr_R",  # VCN has been reset
+        "Toggle_d",  # toggle bit of the F-Device
+        "FV_activated",  # F-Device uses Fail-Safe Values
+        "WD_timeout",  # watchdog of the F-Device expired
+        "CE_CRC",  # F-Device detected a CRC error
+        "Device_Fault",
+        "iPar_OK",  # new iParameter values assigned
+    ],
+)
+
+# Control Byte (host -> F-Device), bit 7 first
+ControlByte = namedtuple(
+    "ControlByte",
+    [
+        "Bit7",
+        "Bit6",
+        "Toggle_h",  # toggle bit of the host
+        "activate_FV",  # activate Fail-Safe Values
+        "Use_TO2",  # use secondary watchdog
+        "R_cons_nr",  # reset VCN
+        "OA_Req",  # operator acknowledge request
+        "iPar_EN",  # iParameter assignment blocked
+    ],
+)
+
+
+def bits_of_byte(value):
+    return tuple((value >> bit) & 1 for bit in range(7, -1, -1))
+
+
+STATUS_BYTE_TABLE = tuple(StatusByte(*bits_of_byte(value)) for value in range(256))
+CONTROL_BYTE_TABLE = tuple(ControlByte(*bits_of_byte(value)) for value in range(256))
+
+
+def decode_status_byte(value):
+    return STATUS_BYTE_TABLE[value]
+
+
+def decode_control_byte(value):
+    return CONTROL_BYTE_TABLE[value]
+
+
+def encode_control_byte(toggle_h, activate_fv, use_to2, r_cons_nr, oa_req, ipar_en):
+    # bit 7 is always set by the host
+    return (
+        0x80
+        | (toggle_h << 5)
+        | (activate_fv << 4)
+        | (use_to2 << 3)
+        | (r_cons_nr << 2)
+        | (oa_req << 1)
+        | ipar_en
+    )
+
+
+def encode_status_byte(
+    cons_nr_r, toggle_d, fv_activated, wd_timeout, ce_crc, device_fault, ipar_ok
+):
+    return (
+        (cons_nr_r << 6)
+        | (toggle_d << 5)
+        | (fv_activated << 4)
+        | (wd_timeout << 3)
+        | (ce_crc << 2)
+        | (device_fault << 1)
+        | ipar_ok
+    )
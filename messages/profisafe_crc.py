@@ -0,0 +1,366 @@
+import struct
+import timeit
+from collections import namedtuple
+from functools import lru_cache
+
+import crcmod
+
+# CRC2 generator polynomials (PROFIsafe V2)
+CRC24_POLY = 0x15D6DCB  # 3-Byte-CRC
+CRC32_POLY = 0x1F4ACFB13  # 4-Byte-CRC
+
+CRC_POLYS = {3: CRC24_POLY, 4: CRC32_POLY}
+
+# CRC1 (F_Par_CRC) over the F-Parameters, CRC-Seed16
+CRC1_POLY = 0x14EAB
+
+# F-Parameters covered by CRC1, as coded in the F-Parameter block.
+# F_WD_Time_2 and F_iPar_CRC are only part of the block if not None.
+FParameters = namedtuple(
+    "FParameters",
+    [
+        "f_source_add",
+        "f_dest_add",
+        "f_wd_time",
+        "f_check_seqnr",
+        "f_check_ipar",
+        "f_sil",  # 0: SIL1 1: SIL2 2: SIL3 3: NoSIL
+        "f_crc_length",  # 0: 3-Byte-CRC 1: 2-Byte-CRC 2: 4-Byte-CRC
+        "f_crc_seed",  # 0: CRC-Seed16 1: CRC-Seed24/32
+        "f_passivation",
+        "f_block_id",
+        "f_par_version",  # 1: V2 mode
+        "f_wd_time_2",
+        "f_ipar_crc",
+    ],
+    defaults=[150, 0, 0, 2, 0, 0, 0, 0, 1, None, None],
+)
+
+
+def make_crc_table(poly, width):
+    # MSB first (non reflected) table, one entry per possible top byte
+    mask = (1 << width) - 1
+    top_bit = 1 << (width - 1)
+    table = []
+    for byte in range(256):
+        crc = byte << (width - 8)
+        for _ in range(8):
+            if crc & top_bit:
+                crc = ((crc << 1) ^ poly) & mask
+            else:
+                crc = (crc << 1) & mask
+        table.append(crc)
+    return tuple(table)
+
+
+class CRC2Engine:
+    """Table driven CRC2 over a safety PDU.
+
+    The byte order matches the PDU layout used by the host so far:
+    the seed (CRC1) is followed by the payload in reverse order, the VCN
+    least significant byte first and a single zero pad byte. Payload and
+    VCN are passed separately so no intermediate list is built.
+    """
+
+    def __init__(self, crc_length=3):
+        if crc_length not in CRC_POLYS:
+            raise ValueError(f"unsupported CRC length: {crc_length}")
+        poly = CRC_POLYS[crc_length]
+        self.crc_length = crc_length
+        self.width = crc_length * 8
+        self.mask = (1 << self.width) - 1
+        self.shift = self.width - 8
+        self.table = make_crc_table(poly, self.width)
+        # crcmod runs the same table in C for runs of bytes
+        self.crc_func = crcmod.mkCrcFun(poly, initCrc=0, xorOut=0x0, rev=False)
+        self.zero_suffix = self.vcn_suffix(0)
+        self.vcn_tables = self._make_vcn_tables()
+        # crc(0, vcn) per VCN byte, see vcn_term()
+        self.vcn_term_tables = tuple(
+            tuple(self.crc_func(self.vcn_suffix(value << shift), 0) for value in range(256))
+            for shift in range(0, self.width, 8)
+        )
+
+    def _make_vcn_tables(self):
+        # The CRC is linear in the VCN: crc(r, vcn) = crc(r, 0) ^ crc(0, vcn).
+        # crc(0, vcn) maps the width VCN bits one to one onto the CRC bits,
+        # so the map is inverted once (Gauss-Jordan over GF(2)) and stored
+        # as one table per CRC byte, mapping CRC bits back to VCN bits.
+        rows = {}  # pivot bit -> (crc bits, vcn bits)
+        for bit in range(self.width):
+            crc = self.crc_func(self.vcn_suffix(1 << bit), 0)
+            vcn = 1 << bit
+            for pivot, (pivot_crc, pivot_vcn) in rows.items():
+                if crc >> pivot & 1:
+                    crc ^= pivot_crc
+                    vcn ^= pivot_vcn
+            if crc == 0:
+                raise ValueError("CRC of the VCN is not invertible")
+            pivot = crc.bit_length() - 1
+            for other, (other_crc, other_vcn) in rows.items():
+                if other_crc >> pivot & 1:
+                    rows[other] = (other_crc ^ crc, other_vcn ^ vcn)
+            rows[pivot] = (crc, vcn)
+
+        tables = []
+        for byte in range(self.crc_length):
+            table = []
+            for value in range(256):
+                vcn = 0
+                for bit in range(8):
+                    if value >> bit & 1:
+                        vcn ^= rows[byte * 8 + bit][1]
+                table.append(vcn)
+            tables.append(tuple(table))
+        return tuple(tables)
+
+    def step(self, crc, byte):
+        # fold a single byte into the register
+        return ((crc << 8) & self.mask) ^ self.table[(crc >> self.shift) ^ byte]
+
+    def update(self, crc, payload, end=None):
+        # fold payload[:end] (last byte first) into the register
+        if end is None:
+            end = len(payload)
+        if end <= 0:
+            return crc
+        chunk = payload[end - 1 :: -1]
+        if not isinstance(chunk, (bytes, bytearray)):
+            chunk = bytes(chunk)
+        return self.crc_func(chunk, crc)
+
+    def vcn_suffix(self, vcn):
+        # VCN (least significant byte first) followed by the zero pad
+        return vcn.to_bytes(self.crc_length + 1, "little")
+
+    def update_vcn(self, crc, vcn):
+        return self.crc_func(self.vcn_suffix(vcn), crc)
+
+    def compute(self, seed, vcn, payload, end=None):
+        return self.update_vcn(self.update(seed, payload, end), vcn)
+
+    def vcn_term(self, vcn):
+        # contribution of the VCN alone, crc(r, vcn) = crc(r, 0) ^ vcn_term(vcn)
+        tables = self.vcn_term_tables
+        term = 0
+        for table in tables:
+            term ^= table[vcn & 0xFF]
+            vcn >>= 8
+        return term
+
+    def received_crc(self, pdu):
+        # CRC trailer of a received PDU (big endian)
+        return int.from_bytes(pdu[-self.crc_length :], "big")
+
+    def check(self, seed, vcn, pdu):
+        # pdu holds the payload followed by the received CRC
+        end = len(pdu) - self.crc_length
+        return self.compute(seed, vcn, pdu, end) == self.received_crc(pdu)
+
+    def recover_vcn(self, seed, pdu):
+        # the only VCN for which the CRC of pdu is valid. Every CRC value
+        # maps to some VCN, so a corrupted PDU yields a wrong VCN too.
+        end = len(pdu) - self.crc_length
+        crc = self.crc_func(self.zero_suffix, self.update(seed, pdu, end))
+        syndrome = crc ^ self.received_crc(pdu)
+        vcn = 0
+        for table in self.vcn_tables:
+            vcn ^= table[syndrome & 0xFF]
+            syndrome >>= 8
+        return vcn
+
+
+class CRC2State:
+    """CRC2 state of a single F-connection.
+
+    The seed (CRC1) is fixed per connection and the VCN only increments, so
+    the encoded VCN suffix is cached for the current and the next expected
+    VCN. Per cycle only the payload is folded into the register.
+    """
+
+    def __init__(self, seed, crc_length=3):
+        self.engine = get_crc2_engine(crc_length)
+        self.seed = seed
+        self.crc_length = crc_length
+        self.vcn = None
+        self.vcn_suffix = b""
+        self.next_vcn = None
+        self.next_vcn_suffix = b""
+
+    def get_vcn_suffix(self, vcn):
+        if vcn == self.vcn:
+            return self.vcn_suffix
+        if vcn == self.next_vcn:
+            # the expected increment: move on, only the new successor is
+            # encoded
+            self.vcn = vcn
+            self.vcn_suffix = self.next_vcn_suffix
+        else:
+            self.vcn = vcn
+            self.vcn_suffix = self.engine.vcn_suffix(vcn)
+        self.next_vcn = vcn + 1
+        self.next_vcn_suffix = self.engine.vcn_suffix(vcn + 1)
+        return self.vcn_suffix
+
+    def compute(self, vcn, payload, end=None):
+        engine = self.engine
+        crc = engine.update(self.seed, payload, end)
+        return engine.crc_func(self.get_vcn_suffix(vcn), crc)
+
+    def check(self, vcn, pdu):
+        # pdu holds the payload followed by the received CRC
+        split = len(pdu) - self.crc_length
+        return self.compute(vcn, pdu, split) == int.from_bytes(pdu[split:], "big")
+
+
+class VCNTracker:
+    """Follows the VCN of a monitored F-connection.
+
+    Every PDU is solved with CRC2Engine.recover_vcn(), which costs about as
+    much as a single CRC check, so checking the x and x + 1 candidates
+    would not be cheaper. Once locked the VCN only stays the same or
+    increments; a recovered VCN doing anything else (a corrupted PDU or a
+    VCN reset) drops the lock until the next PDU confirms the new VCN.
+    """
+
+    def __init__(self, seed, crc_length=3):
+        self.engine = get_crc2_engine(crc_length)
+        self.seed = seed
+        self.vcn = None
+        self.locked = False
+        self.tracked = 0  # PDUs matching x or x + 1
+        self.jumps = 0  # PDUs that broke the lock
+
+    def update(self, pdu):
+        # returns the VCN of pdu, None while the VCN is not locked
+        vcn = self.engine.recover_vcn(self.seed, pdu)
+        previous = self.vcn
+        self.vcn = vcn
+        if previous is not None and 0 <= vcn - previous <= 1:
+            self.tracked += 1
+            self.locked = True
+            return vcn
+        if previous is not None:
+            self.jumps += 1
+        self.locked = False
+        return None
+
+
+CRC2_ENGINES = {length: CRC2Engine(length) for length in CRC_POLYS}
+
+
+def payload_crc(seed, control_byte, data, crc_length=3):
+    """CRC2 register after control byte, data (bytes) and a zero VCN.
+
+    Only CRC2Engine.vcn_term() has to be added per cycle, see
+    constant_payload_crc() for the payloads worth caching.
+    """
+    engine = get_crc2_engine(crc_length)
+    # the control byte trails the data, so it is folded first
+    crc = engine.step(seed, control_byte)
+    return engine.crc_func(engine.zero_suffix, engine.update(crc, data))
+
+
+@lru_cache(maxsize=1024)
+def constant_payload_crc(seed, control_byte, data, crc_length=3):
+    """payload_crc() of the constant payloads, fail-safe values and the test
+    pattern.
+
+    During mass fault events many connections send them with the same few
+    control bytes, so the register is cached per connection seed, control
+    byte and payload. Process data changes every cycle and would only
+    evict these entries, it is computed by payload_crc() uncached.
+    """
+    return payload_crc(seed, control_byte, data, crc_length)
+
+
+CRC1_FUNCS = {
+    2: crcmod.mkCrcFun(CRC1_POLY, initCrc=0, xorOut=0x0, rev=False),
+    3: CRC2_ENGINES[3].crc_func,
+    4: CRC2_ENGINES[4].crc_func,
+}
+
+
+def get_crc2_engine(crc_length):
+    try:
+        return CRC2_ENGINES[crc_length]
+    except KeyError:
+        raise ValueError(f"unsupported CRC length: {crc_length}") from None
+
+
+def encode_f_parameters(params):
+    # F-Parameter block (big endian) without F_Par_CRC
+    flag1 = (
+        params.f_check_seqnr
+        | (params.f_check_ipar << 1)
+        | (params.f_sil << 2)
+        | (params.f_crc_length << 4)
+        | (params.f_crc_seed << 6)
+    )
+    flag2 = params.f_passivation | (params.f_block_id << 3) | (params.f_par_version << 6)
+    block = bytes([flag1, flag2]) + struct.pack(
+        ">HHH", params.f_source_add, params.f_dest_add, params.f_wd_time
+    )
+    if params.f_wd_time_2 is not None:
+        block += params.f_wd_time_2.to_bytes(2, "big")
+    if params.f_ipar_crc is not None:
+        block += params.f_ipar_crc.to_bytes(4, "big")
+    return block
+
+
+@lru_cache(maxsize=None)
+def compute_crc1(params):
+    """CRC1 (F_Par_CRC) of a set of F-Parameters, the seed of CRC2.
+
+    Connections of one GSDML share all F-Parameters but the addresses, so
+    the result is memoized per FParameters tuple.
+    """
+    if params.f_crc_seed:
+        # CRC-Seed24/32 uses the CRC2 polynomial
+        width = 4 if params.f_crc_length == 2 else 3
+    else:
+        width = 2
+    return CRC1_FUNCS[width](encode_f_parameters(params), 0)
+
+
+def main():
+    # micro benchmark against the former list/hex based code path
+    crc2_func = crcmod.mkCrcFun(CRC24_POLY, initCrc=0, xorOut=0x0, rev=False)
+    engine = get_crc2_engine(3)
+    seed = 0x22FF
+    vcn = 0x1234
+    pdu = bytearray([0xC3, 0x7E, 0, 0xFF, 0, 0, 0, 0, 0x80])
+    pdu += engine.compute(seed, vcn, pdu).to_bytes(3, "big")
+
+    def legacy():
+        return hex(
+            crc2_func(
+                bytearray([0x00] + list(vcn.to_bytes(3, "big")) + list(pdu[:-3]))[
+                    ::-1
+                ],
+                crc=seed,
+            )
+        ) == hex(int.from_bytes(bytes(pdu[-3:]), "big"))
+
+    def engine_check():
+        return engine.check(seed, vcn, pdu)
+
+    state = CRC2State(seed)
+
+    def state_check():
+        return state.check(vcn, pdu)
+
+    assert legacy() and engine_check() and state_check()
+
+    runs = 100000
+    for name, func in (
+        ("legacy", legacy),
+        ("engine", engine_check),
+        ("state", state_check),
+    ):
+        duration = timeit.timeit(func, number=runs)
+        print(f"{name:>8}: {duration / runs * 1e6:.3f} us/PDU")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+from time import perf_counter_ns
+
+from context import ProfiSafeHostContext
+from helper.latency import InstrumentedHostContext
+from helper.timer_wheel import TimerWheel
+from messages.pnio_rt import parse_frame_header, parse_raw_data_message
+from messages.profisafe_crc import compute_crc1
+from states import PREPARE_MESSAGE_INIT
+
+logger = logging.getLogger("profisafe.runtime")
+
+
+class ProfiSafeConnection:
+    __slots__ = ("frame_id", "device", "data_index", "context", "peer")
+
+    def __init__(self, frame_id, device, data_index, context):
+        self.frame_id = frame_id
+        self.device = device
+        self.data_index = data_index  # index of the safety PDU in the frame data
+        self.context = context
+        self.peer = None
+
+
+class ProfiSafeHostRuntime:
+    """Hosts many ProfiSafeHostContext instances on one asyncio loop.
+
+    Cyclic frames from the transport are dispatched by FrameID (unique per
+    IOCR, so per F-connection), the resulting safety PDU is sent back to the
+    peer the frame came from. All host watchdogs share one timer wheel
+    advanced by the loop.
+
+    With instrument=True every connection records its cycle latencies (see
+    helper.latency), export them with latency_report(). Without it the
+    uninstrumented context and frame handler are used.
+    """
+
+    def __init__(self, transport, tick_ns=1_000_000, instrument=False):
+        self.transport = transport
+        self.watchdog = TimerWheel(tick_ns=tick_ns)
+        self.connections = {}
+        self.unknown_frames = 0
+        self.instrument = instrument
+        if instrument:
+            self.handle_frame = self._handle_frame_instrumented
+        self._tasks = []
+
+    def add_connection(
+        self,
+        frame_id,
+        device,
+        crc1=None,
+        data_length=8,
+        data_index=0,
+        wd_time=500,
+        seed_zero=True,
+        f_source_add=None,
+        f_dest_add=None,
+    ):
+        if frame_id in self.connections:
+            raise ValueError(f"FrameID {frame_id:#06x} already in use")
+        if crc1 is None:
+            # seed from the GSDML F-Parameters and the connection addresses
+            record = device.f_parameter_record
+            if record is None or f_source_add is None or f_dest_add is None:
+                raise ValueError("crc1 or F-Parameters with addresses required")
+            crc1 = compute_crc1(
+                record.get_f_parameters(f_source_add, f_dest_add, F_WD_Time=wd_time)
+            )
+        context_type = (
+            InstrumentedHostContext if self.instrument else ProfiSafeHostContext
+        )
+        context = context_type(
+            state=PREPARE_MESSAGE_INIT,
+            crc1=crc1,
+            dataLength=data_length,
+            seed_zero=seed_zero,
+            watchdog=self.watchdog,
+            wd_time=wd_time,
+        )
+        context.prepareMessage(None)
+        connection = ProfiSafeConnection(frame_id, device, data_index, context)
+        # send the fault PDU prepared on a watchdog timeout right away
+        context.host_timer.callback = lambda: self.handle_timeout(connection)
+        self.connections[frame_id] = connection
+        return connection
+
+    def remove_connection(self, frame_id):
+        connection = self.connections.pop(frame_id)
+        if connection.context.host_timer is not None:
+            connection.context.host_timer.stop()
+
+    def decode_frame(self, frame):
+        # (connection, safety PDU) of a cyclic frame, None for frames of
+        # unknown connections
+        header = parse_frame_header(memoryview(frame))
+        connection = None if header is None else self.connections.get(header[0])
+        if connection is None:
+            self.unknown_frames += 1
+            return None
+
+        message = parse_raw_data_message(frame, connection.device)
+        return connection, message.input_data["data"][connection.data_index]
+
+    def handle_pdu(self, connection, pdu, peer):
+        connection.peer = peer
+        connection.context.updateData(pdu)
+        self.send(connection)
+
+    def handle_frame(self, frame, peer):
+        decoded = self.decode_frame(frame)
+        if decoded is not None:
+            self.handle_pdu(*decoded, peer)
+
+    def _handle_frame_instrumented(self, frame, peer):
+        # handle_frame() recording the frame decode time
+        start = perf_counter_ns()
+        decoded = self.decode_frame(frame)
+        if decoded is not None:
+            decoded[0].context.metrics.decode.record(perf_counter_ns() - start)
+            self.handle_pdu(*decoded, peer)
+
+    def latency_report(self, percentiles=None):
+        # {frame_id: {phase: summary}} of all instrumented connections
+        kwargs = {} if percentiles is None else {"percentiles": percentiles}
+        return {
+            frame_id: connection.context.metrics.export(**kwargs)
+            for frame_id, connection in self.connections.items()
+            if isinstance(connection.context, InstrumentedHostContext)
+        }
+
+    def handle_timeout(self, connection):
+        connection.context.timeout()
+        if connection.peer is not None:
+            self.send(connection)
+
+    def send(self, connection):
+        self.transport.send(
+            connection.frame_id, connection.context.profisafe_block, connection.peer
+        )
+
+    async def _receive(self):
+        transport = self.transport
+        while True:
+            frame, peer = await transport.recv()
+            try:
+                self.handle_frame(frame, peer)
+            except Exception:
+                logger.exception("failed to handle frame from %s", peer)
+
+    async def _watch(self):
+        watchdog = self.watchdog
+        tick = watchdog.tick_ns / 1e9
+        while True:
+            watchdog.advance()
+            await asyncio.sleep(tick)
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._receive()),
+            asyncio.create_task(self._watch()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.transport.close()
+
+    async def run(self):
+        self.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
+
+
+async def serve(port=34962):
+    from helper.gsdml_cache import load_device
+    from transport import UDPFrameTransport
+
+    device = load_device("./gsdml/test_project.xml")
+    runtime = ProfiSafeHostRuntime(await UDPFrameTransport.create(port=port))
+    runtime.add_connection(0x8000, device, crc1=0x22FF)
+    await runtime.run()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import logging
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+
+from helper.shm_ring import ShmRing
+from messages.pnio_rt import parse_frame_header
+from transport import FrameSender
+
+logger = logging.getLogger("profisafe.sharded")
+
+# Everything a worker needs to set up one F-connection, picklable so it
+# can be handed to the worker process. Without crc1 the seed is computed
+# from the GSDML F-Parameters and the two addresses.
+ConnectionSpec = namedtuple(
+    "ConnectionSpec",
+    [
+        "frame_id",
+        "gsdml_path",
+        "crc1",
+        "data_length",
+        "data_index",
+        "wd_time",
+        "f_dest_add",
+        "f_source_add",
+    ],
+    defaults=[None, 8, 0, 500, None, None],
+)
+
+
+def shard_of(spec, workers):
+    # connections are partitioned by F_Dest_Add, FrameID if it is unknown
+    key = spec.frame_id if spec.f_dest_add is None else spec.f_dest_add
+    return key % workers
+
+
+class RingFrameTransport(FrameSender):
+    """Sends replies of a worker into its outbound shared-memory ring.
+
+    Frames are not received through the transport, the worker pops them
+    from its inbound ring and calls handle_frame() itself.
+    """
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        self.dropped = 0
+
+    def send(self, frame_id, pdu, peer):
+        slot = self.outbox.reserve()
+        if slot is None:
+            self.dropped += 1
+            return
+        slot[:2] = frame_id.to_bytes(2, "big")
+        slot[2 : 2 + len(pdu)] = pdu
+        slot.release()
+        self.outbox.commit(2 + len(pdu))
+
+
+def worker_main(index, cpu, specs, inbox_spec, outbox_spec, stop, failed):
+    # imported here so the parent does not need the state machine
+    from helper.gsdml_cache import load_device
+    from runtime import ProfiSafeHostRuntime
+
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+
+    inbox = ShmRing.attach(*inbox_spec)
+    outbox = ShmRing.attach(*outbox_spec)
+    runtime = ProfiSafeHostRuntime(RingFrameTransport(outbox))
+    devices = {}
+    for spec in specs:
+        if spec.gsdml_path not in devices:
+            devices[spec.gsdml_path] = load_device(spec.gsdml_path)
+        runtime.add_connection(
+            spec.frame_id,
+            devices[spec.gsdml_path],
+            crc1=spec.crc1,
+            data_length=spec.data_length,
+            data_index=spec.data_index,
+            wd_time=spec.wd_time,
+            f_source_add=spec.f_source_add,
+            f_dest_add=spec.f_dest_add,
+        )
+
+    advance = runtime.watchdog.advance
+    handle_frame = runtime.handle_frame
+    idle = 0
+    while not stop.is_set():
+        # copied out, the parsed message keeps views into the frame
+        frame = inbox.pop()
+        if frame is None:
+            advance()
+            # back off while idle, but stay below one watchdog tick
+            idle = min(idle + 1, 100)
+            time.sleep(idle * 1e-6)
+            continue
+        idle = 0
+        try:
+            handle_frame(frame, index)
+        except Exception:
+            # a malformed frame must not take the whole shard down
+            failed.value += 1
+            if failed.value == 1:
+                logger.exception("worker %d failed to handle a frame", index)
+        advance()
+
+    inbox.close()
+    outbox.close()
+
+
+class ShardedProfiSafeHost:
+    """Spreads F-connections over a pool of worker processes.
+
+    Each worker is pinned to one CPU and runs a ProfiSafeHostRuntime for its
+    share of the connections. Frames are handed to the workers and replies
+    collected through one pair of shared-memory rings per worker, so no
+    frame is pickled. Frames a worker failed to handle are counted in
+    failed_frames, check_workers() raises once a worker has died.
+    """
+
+    def __init__(self, specs, workers=None, cpus=None, ring_slots=4096):
+        if cpus is None and hasattr(os, "sched_getaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+        if workers is None:
+            workers = len(cpus) if cpus else os.cpu_count()
+        self.workers = workers
+        self.cpus = cpus
+        self.ring_slots = ring_slots
+        self.shards = [[] for _ in range(workers)]
+        self.frame_shard = {}
+        for spec in specs:
+            shard = shard_of(spec, workers)
+            self.shards[shard].append(spec)
+            self.frame_shard[spec.frame_id] = shard
+        self.inboxes = []
+        self.outboxes = []
+        self.processes = []
+        self.failed = []
+        self.stop_event = None
+        self.dropped = 0
+        self.unknown_frames = 0
+
+    def start(self):
+        self.stop_event = multiprocessing.Event()
+        for index, specs in enumerate(self.shards):
+            failed = multiprocessing.Value("Q", 0, lock=False)
+            inbox = ShmRing.create(slots=self.ring_slots, slot_size=1536)
+            outbox = ShmRing.create(slots=self.ring_slots, slot_size=64)
+            cpu = self.cpus[index % len(self.cpus)] if self.cpus else None
+            process = multiprocessing.Process(
+                target=worker_main,
+                args=(
+                    index,
+                    cpu,
+                    specs,
+                    inbox.spec(),
+                    outbox.spec(),
+                    self.stop_event,
+                    failed,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.inboxes.append(inbox)
+            self.outboxes.append(outbox)
+            self.processes.append(process)
+            self.failed.append(failed)
+
+    @property
+    def failed_frames(self):
+        # frames the workers dropped because handling them raised
+        return sum(failed.value for failed in self.failed)
+
+    def dead_workers(self):
+        # (index, exitcode) of every worker that is no longer running
+        return [
+            (index, process.exitcode)
+            for index, process in enumerate(self.processes)
+            if not process.is_alive()
+        ]
+
+    def check_workers(self):
+        dead = self.dead_workers()
+        if dead:
+            raise RuntimeError(
+                ", ".join(
+                    f"worker {index} exited with code {exitcode}"
+                    for index, exitcode in dead
+                )
+            )
+
+    def try_dispatch(self, frame):
+        """Hands frame to the worker of its connection.
+
+        Returns True if it was queued, False if the ring of the worker is
+        full (not counted as dropped, so the caller may retry) and None for
+        frames of unknown connections.
+        """
+        header = parse_frame_header(memoryview(frame))
+        shard = None if header is None else self.frame_shard.get(header[0])
+        if shard is None:
+            self.unknown_frames += 1
+            return None
+        return self.inboxes[shard].push(frame)
+
+    def dispatch(self, frame):
+        # called by the receive thread for every frame, frames that do not
+        # fit into the ring are dropped
+        queued = self.try_dispatch(frame)
+        if queued is False:
+            self.dropped += 1
+        return bool(queued)
+
+    def poll_replies(self):
+        # replies are FrameID (2 bytes) + PDU, see transport.encode_reply
+        replies = []
+        for outbox in self.outboxes:
+            while True:
+                reply = outbox.pop()
+                if reply is None:
+                    break
+                replies.append(reply)
+        return replies
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join()
+        for ring in self.inboxes + self.outboxes:
+            ring.close()
+        self.inboxes = []
+        self.outboxes = []
+        self.processes = []
+        self.failed = []
+
+
+def benchmark(frames, connections, workers, timeout=60):
+    # replays the capture once per connection, each under its own FrameID
+    specs = [
+        ConnectionSpec(0x8000 + index, "./gsdml/test_project.xml", 0x22FF)
+        for index in range(connections)
+    ]
+    host = ShardedProfiSafeHost(specs, workers=workers)
+    host.start()
+    time.sleep(1)  # workers load the GSDML
+
+    def wait():
+        # back off while the workers catch up, give up if one died or the
+        # replies do not arrive in time
+        host.check_workers()
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{received} of {expected} replies received")
+        time.sleep(1e-5)
+
+    expected = 0
+    received = 0
+    deadline = time.monotonic() + timeout
+    start = time.perf_counter()
+    try:
+        for frame in frames:
+            for spec in specs:
+                retagged = bytearray(frame)
+                retagged[14:16] = spec.frame_id.to_bytes(2, "big")
+                while not host.try_dispatch(retagged):
+                    replies = len(host.poll_replies())
+                    received += replies
+                    if not replies:
+                        wait()
+                expected += 1
+            received += len(host.poll_replies())
+        while received + host.failed_frames < expected:
+            replies = len(host.poll_replies())
+            received += replies
+            if not replies:
+                wait()
+        duration = time.perf_counter() - start
+    finally:
+        host.stop()
+    return expected / duration
+
+
+def main():
+    from helper.pcap_reader import iter_frames
+
+    frames = [bytes(frame) for frame in iter_frames("./sniff/only_status_msgs.pcap")]
+    frames = frames[:400]
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else 1
+    for workers in range(1, cpus + 1):
+        rate = benchmark(frames, connections=8 * cpus, workers=workers)
+        print(f"{workers:>3} workers: {rate:10.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import asyncio
+import time
+from collections import Counter
+
+from messages.pnio_rt import APDU_STATUS, ETHERTYPE_PROFINET
+from messages.profisafe_codec import decode_control_byte, encode_status_byte
+from messages.profisafe_crc import CRC2State
+from transport import FrameTransport
+
+# IOxS and data status of a running device with valid data
+IOXS_GOOD = 0x80
+DATA_STATUS_RUN = 0x35
+DEVICE_MAC = bytes.fromhex("02000000aa00")
+HOST_MAC = bytes.fromhex("02000000bb00")
+
+
+class SimulatedFDevice:
+    """Device side of one F-connection.
+
+    The last accepted host PDU is acknowledged by mirroring its Toggle_h
+    into Toggle_d and R_cons_nr into cons_nr_R. The consecutive number is
+    counted on every new Toggle_h the way the host counts it, host PDUs
+    are checked against it and the answer CRC2 is computed over it.
+    Faults are injected for a number of answers with inject().
+    """
+
+    __slots__ = (
+        "frame_id",
+        "data",
+        "crc_length",
+        "crc_state",
+        "pdu_offset",
+        "frame",
+        "cycle_counter",
+        "cycle_step",
+        "vcn",
+        "toggle_d",
+        "cons_nr_r",
+        "fv_activated",
+        "ce_crc",
+        "wd_timeout",
+        "corrupt_crc",
+        "received",
+        "crc_errors",
+    )
+
+    def __init__(
+        self,
+        frame_id,
+        crc1,
+        layout,
+        data_index=0,
+        data_length=8,
+        crc_length=3,
+        cycle_step=32,
+    ):
+        start, end = layout.data[data_index]
+        if end - start != data_length + 1 + crc_length:
+            raise ValueError(
+                f"F-PDU of {end - start} bytes does not match data length "
+                f"{data_length} and CRC length {crc_length}"
+            )
+        self.frame_id = frame_id
+        self.data = bytes(data_length)  # F-Data sent to the host
+        self.crc_length = crc_length
+        self.crc_state = CRC2State(crc1, crc_length)
+
+        # frame template: ethernet header, FrameID, cyclic data, APDU status
+        header = (
+            HOST_MAC
+            + DEVICE_MAC
+            + ETHERTYPE_PROFINET.to_bytes(2, "big")
+            + frame_id.to_bytes(2, "big")
+        )
+        self.pdu_offset = len(header) + start
+        self.frame = bytearray(header + bytes(layout.length + APDU_STATUS.size))
+        for offset in layout.iops_offsets + layout.iocs_offsets:
+            self.frame[len(header) + offset] = IOXS_GOOD
+        self.cycle_counter = 0
+        self.cycle_step = cycle_step
+
+        self.vcn = 0
+        self.toggle_d = 0
+        self.cons_nr_r = 0
+        self.fv_activated = 1  # until the first host PDU is accepted
+
+        # remaining answers with the fault injected
+        self.ce_crc = 0
+        self.wd_timeout = 0
+        self.corrupt_crc = 0
+
+        self.received = 0
+        self.crc_errors = 0
+
+    def inject(self, ce_crc=0, wd_timeout=0, corrupt_crc=0):
+        # CE_CRC / WD_timeout set the status bits, corrupt_crc makes the
+        # host see a CRC error (Host_CE_CRC)
+        self.ce_crc += ce_crc
+        self.wd_timeout += wd_timeout
+        self.corrupt_crc += corrupt_crc
+
+    def handle_pdu(self, pdu):
+        # host PDU: F-Data, Control Byte, CRC2
+        self.received += 1
+        control = decode_control_byte(pdu[-self.crc_length - 1])
+        vcn = self.vcn
+        if control.Toggle_h != self.toggle_d:
+            if control.R_cons_nr:
+                vcn = 1
+            else:
+                # follows the host, whose counter wraps from 0xFFFFFF to 1
+                vcn = vcn + 1 if vcn != 0x1000000 else 2
+        if not self.crc_state.check(vcn, pdu):
+            self.crc_errors += 1
+            self.ce_crc = max(self.ce_crc, 1)
+            return
+        self.vcn = vcn
+        self.toggle_d = control.Toggle_h
+        self.cons_nr_r = control.R_cons_nr
+        self.fv_activated = control.activate_FV
+
+    def next_frame(self):
+        """Cyclic frame carrying the current answer F-PDU.
+
+        The frame is rewritten in place by the next call, copy it to keep
+        it longer.
+        """
+        status = encode_status_byte(
+            cons_nr_r=self.cons_nr_r,
+            toggle_d=self.toggle_d,
+            fv_activated=self.fv_activated,
+            wd_timeout=1 if self.wd_timeout else 0,
+            ce_crc=1 if self.ce_crc else 0,
+            device_fault=0,
+            ipar_ok=0,
+        )
+        if self.ce_crc:
+            self.ce_crc -= 1
+        if self.wd_timeout:
+            self.wd_timeout -= 1
+
+        frame = self.frame
+        offset = self.pdu_offset
+        end = offset + len(self.data)
+        frame[offset:end] = self.data
+        frame[end] = status
+        crc = self.crc_state.compute(self.vcn, frame[offset : end + 1])
+        if self.corrupt_crc:
+            self.corrupt_crc -= 1
+            crc ^= 1
+        frame[end + 1 : end + 1 + self.crc_length] = crc.to_bytes(
+            self.crc_length, "big"
+        )
+
+        self.cycle_counter = (self.cycle_counter + self.cycle_step) & 0xFFFF
+        APDU_STATUS.pack_into(
+            frame,
+            len(frame) - APDU_STATUS.size,
+            self.cycle_counter,
+            DATA_STATUS_RUN,
+            0,
+        )
+        return frame
+
+
+class SimulatorTransport(FrameTransport):
+    """Loopback between a host runtime and an FDeviceSimulator.
+
+    Replies of the host are handed to the simulated device right away,
+    frames queued by the simulator are received by the runtime. The
+    runtime asks for the next frame only once the previous one is handled,
+    so a frame counts as done (inbox.join()) with the following recv().
+    """
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.inbox = asyncio.Queue()
+        self.pending = False  # a received frame is being handled
+
+    async def recv(self):
+        if self.pending:
+            self.pending = False
+            self.inbox.task_done()
+        frame = await self.inbox.get()
+        self.pending = True
+        return frame
+
+    def send(self, frame_id, pdu, peer):
+        self.simulator.devices[frame_id].handle_pdu(pdu)
+
+
+class FDeviceSimulator:
+    """Many simulated F-Devices with the cyclic frame layout of one GSDML
+    device, FrameIDs are counted up from first_frame_id."""
+
+    def __init__(
+        self,
+        device,
+        count,
+        crc1,
+        first_frame_id=0x8000,
+        data_index=0,
+        data_length=8,
+        crc_length=3,
+    ):
+        self.device = device
+        self.devices = {}
+        for frame_id in range(first_frame_id, first_frame_id + count):
+            self.devices[frame_id] = SimulatedFDevice(
+                frame_id,
+                crc1,
+                device.frame_layout,
+                data_index=data_index,
+                data_length=data_length,
+                crc_length=crc_length,
+            )
+        self.transport = SimulatorTransport(self)
+
+    def connect(self, runtime, **kwargs):
+        # adds one host connection per simulated device, replies of the
+        # runtime go to the simulator
+        runtime.transport = self.transport
+        for frame_id, device in self.devices.items():
+            runtime.add_connection(
+                frame_id, self.device, crc1=device.crc_state.seed, **kwargs
+            )
+
+    def inject(self, frame_ids=None, **faults):
+        # see SimulatedFDevice.inject(), all devices by default
+        targets = self.devices if frame_ids is None else frame_ids
+        for frame_id in targets:
+            self.devices[frame_id].inject(**faults)
+
+    def step(self, runtime):
+        """One cycle at maximal rate: every device sends a frame which the
+        runtime handles synchronously, the answer returns through the
+        transport before the next device sends."""
+        handle_frame = runtime.handle_frame
+        for frame_id, device in self.devices.items():
+            handle_frame(device.next_frame(), frame_id)
+        return len(self.devices)
+
+    async def run(self, cycles, cycle_time=0.001, timeout=1.0):
+        """Sends one frame per device and cycle through the transport inbox
+        of a started runtime, cycle_time in seconds apart.
+
+        Returns once the runtime has handled every frame, raises
+        TimeoutError if that takes more than timeout seconds after the last
+        cycle, e.g. because the runtime was not started.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        inbox = self.transport.inbox
+        for cycle in range(cycles):
+            for frame_id, device in self.devices.items():
+                inbox.put_nowait((bytes(device.next_frame()), frame_id))
+            delay = start + (cycle + 1) * cycle_time - loop.time()
+            await asyncio.sleep(max(delay, 0))
+        await asyncio.wait_for(inbox.join(), timeout)
+        return cycles * len(self.devices)
+
+    def statistics(self):
+        return {
+            "devices": len(self.devices),
+            "received": sum(device.received for device in self.devices.values()),
+            "crc_errors": sum(device.crc_errors for device in self.devices.values()),
+        }
+
+
+def host_states(runtime):
+    # number of connections per host state
+    return Counter(
+        type(connection.context.getState()).__name__
+        for connection in runtime.connections.values()
+    )
+
+
+def expect_state(runtime, state, frame_ids=None):
+    # raises if one of the connections (all by default) is not in state
+    frame_ids = runtime.connections if frame_ids is None else frame_ids
+    wrong = {
+        frame_id: type(runtime.connections[frame_id].context.getState()).__name__
+        for frame_id in frame_ids
+        if runtime.connections[frame_id].context.getState() is not state
+    }
+    if wrong:
+        raise RuntimeError(
+            f"{len(wrong)} connections not in {type(state).__name__}, "
+            f"e.g. {dict(list(wrong.items())[:5])}"
+        )
+
+
+def main():
+    import sys
+
+    from helper.gsdml_cache import load_device
+    from runtime import ProfiSafeHostRuntime
+    from states import AWAIT_DEVICE_FAULT_ACK, AWAIT_DEVICE_NO_FAULT_ACK
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    device = load_device("./gsdml/test_project.xml")
+    simulator = FDeviceSimulator(device, count, crc1=0x22FF)
+    runtime = ProfiSafeHostRuntime(simulator.transport)
+    simulator.connect(runtime)
+
+    start = time.perf_counter()
+    frames = sum(simulator.step(runtime) for _ in range(cycles))
+    duration = time.perf_counter() - start
+    print(f"{count} devices: {frames / duration:10.0f} frames/s")
+    print(dict(host_states(runtime)), simulator.statistics())
+    expect_state(runtime, AWAIT_DEVICE_NO_FAULT_ACK)
+
+    # fault storm: every tenth device reports CE_CRC once. The host stays in
+    # the fault cycle requesting an operator acknowledgement (oa_req) until
+    # oa_c rises, the other connections are not affected.
+    faulted = list(simulator.devices)[::10]
+    simulator.inject(faulted, ce_crc=1)
+    for _ in range(cycles):
+        simulator.step(runtime)
+    print("after CE_CRC storm", dict(host_states(runtime)), simulator.statistics())
+    expect_state(runtime, AWAIT_DEVICE_FAULT_ACK, faulted)
+    if not all(runtime.connections[frame_id].context.oa_req for frame_id in faulted):
+        raise RuntimeError("operator acknowledgement not requested")
+    healthy = set(simulator.devices) - set(faulted)
+    expect_state(runtime, AWAIT_DEVICE_NO_FAULT_ACK, healthy)
+
+    # operator acknowledgement: oa_c is set for one cycle
+    for frame_id in faulted:
+        runtime.connections[frame_id].context.oa_c = 1
+    simulator.step(runtime)
+    for frame_id in faulted:
+        runtime.connections[frame_id].context.oa_c = 0
+    for _ in range(cycles):
+        simulator.step(runtime)
+    print("after operator ack", dict(host_states(runtime)), simulator.statistics())
+    expect_state(runtime, AWAIT_DEVICE_NO_FAULT_ACK)
+
+    # the same devices paced through the receive task of a started runtime
+    async def paced():
+        runtime.start()
+        try:
+            start = time.perf_counter()
+            frames = await simulator.run(cycles, cycle_time=0.001)
+            duration = time.perf_counter() - start
+        finally:
+            await runtime.stop()
+        print(f"paced, 1 ms cycles: {frames / duration:10.0f} frames/s")
+        print(dict(host_states(runtime)), simulator.statistics())
+        expect_state(runtime, AWAIT_DEVICE_NO_FAULT_ACK)
+
+    asyncio.run(paced())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,293 +1,278 @@
-from context import PSState
-import crcmod
+from functools import lru_cache
 
-from messages.pnio_safe import get_profisafe_pdu
+from context import FAULT_CE_CRC, FAULT_HOST_CE_CRC, FAULT_WD_TIMEOUT, PSState
 
-crc2_func = crcmod.mkCrcFun(0x15D6DCB, initCrc=0, xorOut=0x0, rev=False)
+from messages.pnio_safe import write_profisafe_pdu
+from messages.profisafe_codec import decode_status_byte, encode_control_byte
+from messages.profisafe_crc import get_crc2_engine
+
+# F-Data sent by the host instead of ProfiSafeHostContext.data: fail-safe
+# values during initialisation and a fixed test pattern while a fault is
+# acknowledged, zero padded to the F-Data length of the connection
+TEST_PATTERN = bytes([0xC3, 0x7E, 0, 0xFF])
+
+
+@lru_cache(maxsize=None)
+def failSafeData(dataLength):
+    return bytes(dataLength)
+
+
+@lru_cache(maxsize=None)
+def testPatternData(dataLength):
+    return (TEST_PATTERN + bytes(dataLength))[:dataLength]
 
 
 def extractStatusByteData(statusByte):
-    binaryRep = "{0:08b}".format(statusByte)
-    statusObj = {
-        "Bit7": 1 if int(binaryRep[0]) == 1 else 0,
-        "cons_nr_R": 1 if int(binaryRep[1]) == 1 else 0,
-        "Toggle_d": 1 if int(binaryRep[2]) == 1 else 0,
-        "FV_activated": 1 if int(binaryRep[3]) == 1 else 0,
-        "WD_timeout": 1 if int(binaryRep[4]) == 1 else 0,
-        "CE_CRC": 1 if int(binaryRep[5]) == 1 else 0,
-        "Device_Fault": 1 if int(binaryRep[6]) == 1 else 0,
-        "iPar_OK": 1 if int(binaryRep[7]) == 1 else 0,
-    }
+    return decode_status_byte(statusByte)
+
 
-    return statusObj
+def getControlByte(context):
+    return encode_control_byte(
+        toggle_h=context.toggle_h,
+        activate_fv=context.activate_FV,
+        use_to2=context.use_to2,
+        r_cons_nr=context.r_cons_nr,
+        oa_req=context.oa_req,
+        ipar_en=context.ipar_en,
+    )
 
 
 def isDeviceFault(faults):
-    return faults["Host_CE_CRC"] or faults["CE_CRC"] or faults["WD_timeout"]
+    return faults != 0
+
+
+def restartHostTimer(context):
+    # F_WD_Time starts over, see ProfiSafeHostContext.host_timer. The timer
+    # is one-shot: every state re-arms it when it expires, either with the
+    # PDU its timeout transition sends or just to keep supervising.
+    if context.host_timer is not None:
+        context.host_timer.restart()
+
+
+def acceptedNewPdu(context):
+    # a new PDU passed the CRC2 check of the CHECK_DEVICE_ACK_* state it was
+    # handed to. Stale repeats never get here, corrupt ones set
+    # FAULT_HOST_CE_CRC.
+    return not context.faults & FAULT_HOST_CE_CRC
+
+
+def writePdu(context, data, constant=False):
+    # the PDU to send, into context.profisafe_block (an output slot while
+    # ProfiSafeHostContext.processImage() runs). constant for the fail-safe
+    # and test-pattern data, see write_profisafe_pdu().
+    write_profisafe_pdu(
+        context.profisafe_block,
+        0,
+        control_byte=getControlByte(context),
+        data=data,
+        seed=context.crc1,
+        vcn=context.x,
+        crc_length=context.crcLength,
+        constant=constant,
+    )
+    context.pdus += 1
 
 
 def checkCRC(data, crcLength, crc1, vcn):
-    # print(
-    #     crcLength,
-    #     list(data[: (crcLength * -1)]),
-    #     list(vcn.to_bytes(crcLength, "big")),
-    # )
-    # print(
-    #     "[checkCRC]",
-    #     hex(
-    #         crc2_func(
-    #             bytearray(
-    #                 [0x00]
-    #                 + list(vcn.to_bytes(crcLength, "big"))
-    #                 + list(data[: (crcLength * -1)])
-    #             )[::-1],
-    #             crc=crc1,
-    #         )
-    #     ),
-    #     hex(int.from_bytes(bytes(data[(crcLength * -1) :]), "big")),
-    #     vcn,
-    # )
-    if (
-        hex(
-            crc2_func(
-                bytearray(
-                    [0x00]
-                    + list(vcn.to_bytes(crcLength, "big"))
-                    + list(data[: (crcLength * -1)])
-                )[::-1],
-                crc=crc1,
-            )
-        )
-        == hex(int.from_bytes(bytes(data[(crcLength * -1) :]), "big"))
-    ):
-        return True
-    else:
-        return False
+    return get_crc2_engine(crcLength).check(crc1, vcn, data)
 
 
 # Preparation of a regular safety PDU for the F-Device
 class PrepareMessageInitState(PSState):
-    def updateData(self, data) -> None:
+    def updateData(self, context, data) -> None:
         # TODO what is to do in the init
         return
 
-    def prepareMessage(self, data):
+    def prepareMessage(self, context, data):
         # TODO write build message method in scapy in pnio_safe.py
 
         # Use Fail-Safe Values
-        context = self.context
         context.activate_FV = 1
         context.FV_activated_S = 1
 
         # Toggle Bit
         context.toggle_h = 1
 
-        profisafe_block = get_profisafe_pdu(
-            control_byte={
-                "Toggle_h": self.context.toggle_h,
-                "activate_FV": self.context.activate_FV,
-                "Use_TO2": self.context.use_to2,
-                "R_cons_nr": self.context.r_cons_nr,
-                "OA_Req": self.context.oa_req,
-                "iPar_EN": self.context.ipar_en,
-            },
-            data=[0,0,0,0, 0, 0, 0, 0],
-            seed=0x22FF,
-            vcn=self.context.x,
-        )
+        writePdu(context, failSafeData(context.dataLength), constant=True)
 
-        self.context.profisafe_block = profisafe_block
-
-        self.context.setState(AwaitDeviceInitAckState())
+        context.setState(AWAIT_DEVICE_INIT_ACK)
         return
 
-    def timeout(self):
-        return
+    def timeout(self, context):
+        # not awaiting a PDU yet, the watchdog keeps supervising
+        restartHostTimer(context)
 
 
 # Preparation of a safety PDU for the F-Device (exception handling)
 class PrepareMessageFaultState(PSState):
-    def updateData(self, data) -> None:
+    def updateData(self, context, data) -> None:
         return
 
-    def prepareMessage(self, data):
+    def prepareMessage(self, context, data):
         # TODO craft message -> no more things to do except sending message
 
-        profisafe_block = get_profisafe_pdu(
-            control_byte={
-                "Toggle_h": self.context.toggle_h,
-                "activate_FV": self.context.activate_FV,
-                "Use_TO2": self.context.use_to2,
-                "R_cons_nr": self.context.r_cons_nr,
-                "OA_Req": self.context.oa_req,
-                "iPar_EN": self.context.ipar_en,
-            },
-            data=[0xC3, 0x7E, 0, 0xFF, 0, 0, 0, 0],
-            seed=0x22FF,
-            vcn=self.context.x,
-        )
-
-        self.context.profisafe_block = profisafe_block
+        writePdu(context, testPatternData(context.dataLength), constant=True)
 
-        self.context.setState(AwaitDeviceFaultAckState())
+        context.setState(AWAIT_DEVICE_FAULT_ACK)
         return
 
-    def timeout(self):
-        return
+    def timeout(self, context):
+        # the fault PDU is about to be sent, keep supervising
+        restartHostTimer(context)
 
 
 # Preparation of a regular safety PDU for the F-Device
 class PrepareMessageNoFaultState(PSState):
-    def updateData(self, data) -> None:
+    def updateData(self, context, data) -> None:
         return
 
-    def prepareMessage(self, data):
+    def prepareMessage(self, context, data):
         # TODO craft message -> no more things to do except sending message
-        profisafe_block = get_profisafe_pdu(
-            control_byte={
-                "Toggle_h": self.context.toggle_h,
-                "activate_FV": self.context.activate_FV,
-                "Use_TO2": self.context.use_to2,
-                "R_cons_nr": self.context.r_cons_nr,
-                "OA_Req": self.context.oa_req,
-                "iPar_EN": self.context.ipar_en,
-            },
-            data=[0xC3, 0x7E, 0, 0xFF, 0, 0, 0, 0],
-            seed=0x22FF,
-            vcn=self.context.x,
-        )
-
-        self.context.profisafe_block = profisafe_block
+        writePdu(context, context.data)
 
-        self.context.setState(AwaitDeviceNoFaultAckState())
+        context.setState(AWAIT_DEVICE_NO_FAULT_ACK)
         return
 
-    def timeout(self):
-        return
+    def timeout(self, context):
+        # the regular PDU is about to be sent, keep supervising
+        restartHostTimer(context)
 
 
 # Safety Layer is waiting on next regular safety PDU from F-Device (Acknoledgement)
 class AwaitDeviceInitAckState(PSState):
-    def updateData(self, data) -> None:
-        extractedControlByte = extractStatusByteData(data[-4])
-        self.context.lastStatus = (
+    def updateData(self, context, data) -> None:
+        extractedControlByte = context.extractStatus(data[-4])
+        context.lastStatus = (
             extractedControlByte  # update data in global context state
         )
-        if extractedControlByte["CE_CRC"]:
-            self.context.faults["CE_CRC"] = True
+        if extractedControlByte.CE_CRC:
+            context.faults |= FAULT_CE_CRC
 
-        if extractedControlByte["WD_timeout"]:
-            self.context.faults["WD_timeout"] = True
+        if extractedControlByte.WD_timeout:
+            context.faults |= FAULT_WD_TIMEOUT
         if (
-            extractedControlByte["Toggle_d"] == 1
-            and extractedControlByte["cons_nr_R"] == self.context.r_cons_nr
+            extractedControlByte.Toggle_d == 1
+            and extractedControlByte.cons_nr_R == context.r_cons_nr
         ):
             # T3
-            self.context.setState(CheckDeviceAckToggleEqState())
-            self.context.updateData(data)
+            context.setState(CHECK_DEVICE_ACK_TOGGLE_EQ)
+            context.updateData(data)
+            if acceptedNewPdu(context):
+                restartHostTimer(context)
         return
 
-    def timeout(self):
+    def timeout(self, context):
         # t10
-        # TODO restart timer
+        # the fault PDU sent below is watched again
+        restartHostTimer(context)
         # TODO store faults -> where do we get the faults at timeout ?
 
         # reset whole process -> vcn ...
-        self.context.activate_FV = 1
-        self.context.FV_activated_S = 1
-        self.context.toggle_h = 1 - self.context.toggle_h
-        self.context.r_cons_nr = 1
-        self.context.x = 0
-        self.context.setState(PrepareMessageFaultState())
-        return self.context.prepareMessage(None)
-
-    def prepareMessage(self, data):
+        context.activate_FV = 1
+        context.FV_activated_S = 1
+        context.toggle_h = 1 - context.toggle_h
+        context.r_cons_nr = 1
+        context.x = 0
+        context.setState(PREPARE_MESSAGE_FAULT)
+        return context.prepareMessage(None)
+
+    def prepareMessage(self, context, data):
         # in this case nothing happens -> timeout should set the state to prepareMessage if so
         return
 
 
 # Safety Layer is waiting on next irregular safety PDU from F-Device (Acknoledgement)
 class AwaitDeviceNoFaultAckState(PSState):
-    def updateData(self, data) -> None:
-        extractedControlByte = extractStatusByteData(data[-4])
-        self.context.lastStatus = (
+    def updateData(self, context, data) -> None:
+        extractedControlByte = context.extractStatus(data[-4])
+        context.lastStatus = (
             extractedControlByte  # update data in global context state
         )
-        if extractedControlByte["CE_CRC"]:
-            self.context.faults["CE_CRC"] = True
+        if extractedControlByte.CE_CRC:
+            context.faults |= FAULT_CE_CRC
 
-        if extractedControlByte["WD_timeout"]:
-            self.context.faults["WD_timeout"] = True
-        if extractedControlByte["Toggle_d"] != self.context.toggle_h:
+        if extractedControlByte.WD_timeout:
+            context.faults |= FAULT_WD_TIMEOUT
+        if extractedControlByte.Toggle_d != context.toggle_h:
             # T7
-            self.context.setState(CheckDeviceAckToggleNotEqState())
+            context.setState(CHECK_DEVICE_ACK_TOGGLE_NOT_EQ)
             # TODO call checkdata
             # nothing to do
-            return self.context.updateData(data)
+            return context.updateData(data)
         else:
             # T6
-            self.context.setState(CheckDeviceAckToggleEqState())
-            # TODO restart host-timer
-            return self.context.updateData(data)
+            context.setState(CHECK_DEVICE_ACK_TOGGLE_EQ)
+            context.updateData(data)
+            if acceptedNewPdu(context):
+                restartHostTimer(context)
+            return
 
-    def timeout(self):
+    def timeout(self, context):
         # T12
-        # TODO restart timer
+        # the fault PDU sent after the delay time is watched again
+        restartHostTimer(context)
         # TODO store faults -> where do we get the faults at timeout ?
 
         # reset whole process and use FailSafe Values
-        self.context.activate_FV = 1
-        self.context.FV_activated_S = 1
-        self.context.toggle_h = 1 - self.context.toggle_h
-        self.context.r_cons_nr = 1
-        self.context.x = 0
-        self.context.setState(WaitDelayTimeState())
-        return self.context.timeout()
-
-    def prepareMessage(self, data):
+        context.activate_FV = 1
+        context.FV_activated_S = 1
+        context.toggle_h = 1 - context.toggle_h
+        context.r_cons_nr = 1
+        context.x = 0
+        context.setState(WAIT_DELAY_TIME)
+        return context.timeout()
+
+    def prepareMessage(self, context, data):
         return
 
 
 # Safety Layer is waiting on next regular safety PDU from F-Device (Acknoledgement)
 class AwaitDeviceFaultAckState(PSState):
-    def updateData(self, data) -> None:
-        extractedControlByte = extractStatusByteData(data[-4])
-        self.context.lastStatus = (
+    def updateData(self, context, data) -> None:
+        extractedControlByte = context.extractStatus(data[-4])
+        context.lastStatus = (
             extractedControlByte  # update data in global context state
         )
-        if extractedControlByte["CE_CRC"]:
-            self.context.faults["CE_CRC"] = True
+        # T17 to T19 are decided by the faults of this PDU, the stored ones
+        # led to the fault PDU it acknowledges
+        context.faults = 0
+        if extractedControlByte.CE_CRC:
+            context.faults |= FAULT_CE_CRC
 
-        if extractedControlByte["WD_timeout"]:
-            self.context.faults["WD_timeout"] = True
+        if extractedControlByte.WD_timeout:
+            context.faults |= FAULT_WD_TIMEOUT
 
         if (
-            extractedControlByte["Toggle_d"] == self.context.toggle_h
-            and extractedControlByte["cons_nr_R"] == self.context.r_cons_nr
+            extractedControlByte.Toggle_d == context.toggle_h
+            and extractedControlByte.cons_nr_R == context.r_cons_nr
         ):
             # T16
-            self.context.setState(CheckDeviceAckFaultState())
-            return self.context.updateData(data)
+            context.setState(CHECK_DEVICE_ACK_FAULT)
+            context.updateData(data)
+            if acceptedNewPdu(context):
+                restartHostTimer(context)
+            return
 
-    def timeout(self):
+    def timeout(self, context):
         # T20
         # reset whole process
-        self.context.oa_req = 0  # operator ack request
-        self.context.oa_req_s = 0  # idk
-        self.context.oa_c_e = 0  # idk
+        context.oa_req = 0  # operator ack request
+        context.oa_req_s = 0  # idk
+        context.oa_c_e = 0  # idk
 
         # use FailSafe Values
-        self.context.activate_FV = 1
-        self.context.FV_activated_S = 1
-        self.context.toggle_h = 1 - self.context.toggle_h
-        self.context.r_cons_nr = 1
-        self.context.x = 0
+        context.activate_FV = 1
+        context.FV_activated_S = 1
+        context.toggle_h = 1 - context.toggle_h
+        context.r_cons_nr = 1
+        context.x = 0
 
-        # TODO restart timer
-        self.context.setState(PrepareMessageFaultState())
-        return self.context.prepareMessage()
+        # the fault PDU sent below is watched again
+        restartHostTimer(context)
+        context.setState(PREPARE_MESSAGE_FAULT)
+        return context.prepareMessage(None)
 
-    def prepareMessage(self, data):
+    def prepareMessage(self, context, data):
         return
 
 
@@ -295,64 +280,60 @@ class AwaitDeviceFaultAckState(PSState):
 # virtual consecutive number (x) and for potential
 # F-Device faults within the Status Byte (WD_timeout, CE_CRC)
 class CheckDeviceAckToggleEqState(PSState):
-    def updateData(self, data) -> None:
+    def updateData(self, context, data) -> None:
         # TODO Check CRC of input data
         # TODO store faults from status byte
-        if not checkCRC(
-            data, self.context.crcLength, self.context.crc1, self.context.x + 1
-        ):
-            self.context.faults["Host_CE_CRC"] = True
+        if not context.crc_state.check(context.x + 1, data):
+            context.faults |= FAULT_HOST_CE_CRC
         # TODO
-        if not isDeviceFault(self.context.faults):
-            self.context.old_x = self.context.x
-            self.context.x += 1
-            if self.context.x == 0x1000000:
-                self.context.x = 1
-            self.context.toggle_h = 1 - self.context.toggle_h
+        if not isDeviceFault(context.faults):
+            context.old_x = context.x
+            context.x += 1
+            if context.x == 0x1000000:
+                context.x = 1
+            context.toggle_h = 1 - context.toggle_h
 
             if (
-                self.context.activate_FV_C
-                or self.context.FV_activated
-                or isDeviceFault(self.context.faults)
+                context.activate_FV_C
+                or context.FV_activated
+                or isDeviceFault(context.faults)
             ):
-                self.context.FV_activated_S = 1  # use failsafe input values
+                context.FV_activated_S = 1  # use failsafe input values
             else:
-                self.context.FV_activated_S = 0  # do not use failsafe input values
+                context.FV_activated_S = 0  # do not use failsafe input values
 
-            if self.context.activate_FV_C or isDeviceFault(self.context.faults):
-                self.context.activate_FV = 1  # use failsafe outputs
+            if context.activate_FV_C or isDeviceFault(context.faults):
+                context.activate_FV = 1  # use failsafe outputs
             else:
-                self.context.activate_FV = 0  # do not use failsafe outputs
+                context.activate_FV = 0  # do not use failsafe outputs
 
-            self.context.ipar_ok_s = self.context.ipar_ok
+            context.ipar_ok_s = context.ipar_ok
 
-            self.context.setState(PrepareMessageNoFaultState())
-            return self.context.prepareMessage(data)
+            context.setState(PREPARE_MESSAGE_NO_FAULT)
+            return context.prepareMessage(data)
 
         else:
             # T11
             # reset whole process -> vcn ...
             # use Failsafe Values -> activate failsafe mode
-            self.context.activate_FV = 1
-            self.context.FV_activated_S = 1
+            context.activate_FV = 1
+            context.FV_activated_S = 1
 
-            self.context.toggle_h = 1 - self.context.toggle_h
-            self.context.r_cons_nr = 1
-            self.context.x = 0
+            context.toggle_h = 1 - context.toggle_h
+            context.r_cons_nr = 1
+            context.x = 0
 
-            if checkCRC(
-                data, self.context.crcLength, self.context.crc1, self.context.x
-            ):
-                self.context.faults["Host_CE_CRC"] = True
+            if context.crc_state.check(context.x, data):
+                context.faults |= FAULT_HOST_CE_CRC
 
-            self.context.setState(PrepareMessageFaultState())
-            return self.context.prepareMessage(data)
+            context.setState(PREPARE_MESSAGE_FAULT)
+            return context.prepareMessage(data)
 
-    def timeout(self):
-        # here does nothing happen
-        return
+    def timeout(self, context):
+        # a received PDU is being checked, keep supervising
+        restartHostTimer(context)
 
-    def prepareMessage(self, data):
+    def prepareMessage(self, context, data):
         # here does nothing happen
         return
 
@@ -363,48 +344,50 @@ class CheckDeviceAckToggleEqState(PSState):
 class CheckDeviceAckToggleNotEqState(PSState):
     # TODO Check CRC of input data
 
-    def updateData(self, data) -> None:
-        if not checkCRC(data, self.context.crcLength, self.context.crc1, self.context.x):
-            self.context.faults["Host_CE_CRC"] = True
-        if not isDeviceFault(self.context.faults):
+    def updateData(self, context, data) -> None:
+        if not context.crc_state.check(context.x, data):
+            context.faults |= FAULT_HOST_CE_CRC
+        if not isDeviceFault(context.faults):
             # T8
             # No Update of VCN!!!
             if (
-                self.context.activate_FV_C
-                or self.context.FV_activated
-                or isDeviceFault(self.context.faults)
+                context.activate_FV_C
+                or context.FV_activated
+                or isDeviceFault(context.faults)
             ):
-                self.context.FV_activated_S = 1  # use failsafe input values
+                context.FV_activated_S = 1  # use failsafe input values
             else:
-                self.context.FV_activated_S = 0  # do not use failsafe input values
+                context.FV_activated_S = 0  # do not use failsafe input values
 
-            if self.context.activate_FV_C or isDeviceFault(self.context.faults):
-                self.context.activate_FV = 1  # use failsafe outputs
+            if context.activate_FV_C or isDeviceFault(context.faults):
+                context.activate_FV = 1  # use failsafe outputs
             else:
-                self.context.activate_FV = 0  # do not use failsafe outputs
+                context.activate_FV = 0  # do not use failsafe outputs
 
-            self.context.ipar_ok_s = self.context.ipar_ok
+            context.ipar_ok_s = context.ipar_ok
 
-            self.context.setState(PrepareMessageNoFaultState())
-            return self.context.prepareMessage(data)
+            context.setState(PREPARE_MESSAGE_NO_FAULT)
+            return context.prepareMessage(data)
         else:
             # T14
-            # TODO restart host-timer
+            # a fault PDU is sent instead, watched from now on
+            restartHostTimer(context)
             # TODO store faults
             # Use FailSafe Values
-            self.context.activate_FV = 1
-            self.context.FV_activated_S = 1
-            self.context.toggle_h = 1 - self.context.toggle_h
-            self.context.r_cons_nr = 1
-            self.context.x = 0
+            context.activate_FV = 1
+            context.FV_activated_S = 1
+            context.toggle_h = 1 - context.toggle_h
+            context.r_cons_nr = 1
+            context.x = 0
 
-            self.context.setState(PrepareMessageFaultState())
-            return self.context.prepareMessage(data)
+            context.setState(PREPARE_MESSAGE_FAULT)
+            return context.prepareMessage(data)
 
-    def timeout(self):
-        return
+    def timeout(self, context):
+        # the PDU is checked against old_x, keep supervising
+        restartHostTimer(context)
 
-    def prepareMessage(self, data):
+    def prepareMessage(self, context, data):
         # nothing to do here
         return
 
@@ -414,100 +397,91 @@ class CheckDeviceAckToggleNotEqState(PSState):
 # Once a fault occurred, no automatic restart of a safety function is permitted unless
 # an operator achnowledgement signal (oa_c) arrived
 class CheckDeviceAckFaultState(PSState):
-    def updateData(self, data) -> None:
+    def updateData(self, context, data) -> None:
         # TODO Check CRC of input data
-        if not checkCRC(
-            data, self.context.dataLength, self.context.crc1, self.context.x + 1
-        ):
-            self.context.faults["Host_CE_CRC"] = True
+        if not context.crc_state.check(context.x + 1, data):
+            context.faults |= FAULT_HOST_CE_CRC
 
         if (
-            not isDeviceFault(self.context.faults)
-            and self.context.oa_c_e
-            and self.context.oa_c
+            not isDeviceFault(context.faults)
+            and context.oa_c_e
+            and context.oa_c
         ):
             # T17
             # reset stored faults
-            self.context.faults = {
-                "Host_CE_CRC": False,
-                "CE_CRC": False,
-                "WD_timeout": False,
-            }
+            context.faults = 0
 
             # reset operator ack flags
-            self.context.oa_req_s = 0
-            self.context.oa_req = 0
-            self.context.oa_c_e = 0
+            context.oa_req_s = 0
+            context.oa_req = 0
+            context.oa_c_e = 0
 
             # reset vcn
-            self.context.r_cons_nr = 0
-            self.context.old_x = self.context.x
-            self.context.x += 1
-            if self.context.x == 0x1000000:
-                self.context.x = 1
-            self.context.toggle_h = 1 - self.context.toggle_h
+            context.r_cons_nr = 0
+            context.old_x = context.x
+            context.x += 1
+            if context.x == 0x1000000:
+                context.x = 1
+            context.toggle_h = 1 - context.toggle_h
 
             if (
-                self.context.activate_FV_C
-                or self.context.FV_activated
-                or not isDeviceFault(self.context.faults)
+                context.activate_FV_C
+                or context.FV_activated
+                or not isDeviceFault(context.faults)
             ):
-                self.context.FV_activated_S = 1  # use failsafe input values
+                context.FV_activated_S = 1  # use failsafe input values
             else:
-                self.context.FV_activated_S = 0  # do not use failsafe input values
+                context.FV_activated_S = 0  # do not use failsafe input values
 
-            if self.context.activate_FV_C or isDeviceFault(self.context.faults):
-                self.context.activate_FV = 1  # use failsafe outputs
+            if context.activate_FV_C or isDeviceFault(context.faults):
+                context.activate_FV = 1  # use failsafe outputs
             else:
-                self.context.activate_FV = 0  # do not use failsafe outputs
+                context.activate_FV = 0  # do not use failsafe outputs
 
-            self.context.ipar_ok_s = self.context.ipar_ok
+            context.ipar_ok_s = context.ipar_ok
 
-            self.context.setState(PrepareMessageNoFaultState())
-            return self.prepareMessage(data)
-        elif isDeviceFault(self.context.faults):
+            context.setState(PREPARE_MESSAGE_NO_FAULT)
+            return context.prepareMessage(data)
+        elif isDeviceFault(context.faults):
             # T18
             # TODO store faults
             # reset operator ack flags
-            self.context.oa_req_s = 0
-            self.context.oa_req = 0
-            self.context.oa_c_e = 0
+            context.oa_req_s = 0
+            context.oa_req = 0
+            context.oa_c_e = 0
             # Use FailSafe Values
-            self.context.activate_FV = 1
-            self.context.FV_activated_S = 1
-            self.context.toggle_h = 1 - self.context.toggle_h
-            self.context.r_cons_nr = 1
-            self.context.x = 0
-
-            self.context.setState(PrepareMessageFaultState())
-            return self.prepareMessage(data)
-        elif (
-            not isDeviceFault(self.context.faults)
-            and not self.context.oa_c
-            and not self.context.oa_c_e
-        ):
+            context.activate_FV = 1
+            context.FV_activated_S = 1
+            context.toggle_h = 1 - context.toggle_h
+            context.r_cons_nr = 1
+            context.x = 0
+
+            context.setState(PREPARE_MESSAGE_FAULT)
+            return context.prepareMessage(data)
+        else:
             # T19
-            # operator ack request to reset
-            self.context.oa_req_s = 1
-            self.context.oa_req = 1
-            if self.context.oa_c == 0:
-                self.context.oa_c_e = 1
+            # operator ack request to reset, repeated until oa_c rises
+            context.oa_req_s = 1
+            context.oa_req = 1
+            if context.oa_c == 0:
+                context.oa_c_e = 1
             # use failsafe values
-            self.context.activate_FV = 1
-            self.context.FV_activated_S = 1
-            self.context.toggle_h = 1 - self.context.toggle_h
-            self.context.r_cons_nr = 0
-            self.context.old_x = self.context.x
-            self.context.x += 1
-            if self.context.x == 0x1000000:
-                self.context.x = 1
-            self.context.setState(PrepareMessageFaultState())
-            return self.prepareMessage(data)
-
-    def timeout(self):
-        return
-
-    def prepareMessage(self, data):
+            context.activate_FV = 1
+            context.FV_activated_S = 1
+            context.toggle_h = 1 - context.toggle_h
+            context.r_cons_nr = 0
+            context.old_x = context.x
+            context.x += 1
+            if context.x == 0x1000000:
+                context.x = 1
+            context.setState(PREPARE_MESSAGE_FAULT)
+            return context.prepareMessage(data)
+
+    def timeout(self, context):
+        # the fault acknowledgement is being checked, keep supervising
+        restartHostTimer(context)
+
+    def prepareMessage(self, context, data):
         return
 
 
@@ -515,14 +489,29 @@ class CheckDeviceAckFaultState(PSState):
 # which would cause a request for an operator acknowledge with the next power-on. A delay time of 0ms is
 # permitted
 class WaitDelayTimeState(PSState):
-    def updateData(self, controlByte) -> None:
+    def updateData(self, context, controlByte) -> None:
         return
 
-    def timeout(self):
+    def timeout(self, context):
         # T13
         # TODO Timeout of machine
-        self.context.setState(PrepareMessageFaultState())
-        return self.context.prepareMessage(None)
+        restartHostTimer(context)
+        context.setState(PREPARE_MESSAGE_FAULT)
+        return context.prepareMessage(None)
 
-    def prepareMessage(self, data):
+    def prepareMessage(self, context, data):
         return
+
+
+# States hold no data of their own, so a single instance of each state is
+# shared by all contexts
+PREPARE_MESSAGE_INIT = PrepareMessageInitState()
+PREPARE_MESSAGE_FAULT = PrepareMessageFaultState()
+PREPARE_MESSAGE_NO_FAULT = PrepareMessageNoFaultState()
+AWAIT_DEVICE_INIT_ACK = AwaitDeviceInitAckState()
+AWAIT_DEVICE_NO_FAULT_ACK = AwaitDeviceNoFaultAckState()
+AWAIT_DEVICE_FAULT_ACK = AwaitDeviceFaultAckState()
+CHECK_DEVICE_ACK_TOGGLE_EQ = CheckDeviceAckToggleEqState()
+CHECK_DEVICE_ACK_TOGGLE_NOT_EQ = CheckDeviceAckToggleNotEqState()
+CHECK_DEVICE_ACK_FAULT = CheckDeviceAckFaultState()
+WAIT_DELAY_TIME = WaitDelayTimeState()
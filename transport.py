@@ -0,0 +1,88 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+# Frames travel as raw ethernet frames. Replies carry the FrameID of the
+# frame they answer (2 bytes, big endian) followed by the safety PDU.
+
+
+def encode_reply(frame_id, pdu):
+    return frame_id.to_bytes(2, "big") + pdu
+
+
+def decode_reply(reply):
+    return int.from_bytes(reply[:2], "big"), reply[2:]
+
+
+class FrameSender(ABC):
+    """Reply side of a transport, enough for a runtime whose frames are
+    fed to handle_frame() directly (see sharded.worker_main)."""
+
+    @abstractmethod
+    def send(self, frame_id, pdu, peer):
+        """Send pdu (bytes-like) to peer. The buffer is reused by the
+        caller, so it must be copied before send returns."""
+
+    def close(self):
+        pass
+
+
+class FrameTransport(FrameSender):
+    """Transport a runtime receives its frames from as well, required by
+    ProfiSafeHostRuntime.start()."""
+
+    @abstractmethod
+    async def recv(self):
+        """Wait for the next frame, returns (frame, peer)."""
+
+
+class QueueFrameTransport(FrameTransport):
+    """In-process loopback, frames are put into `inbox` and replies are
+    collected from `outbox` as (reply, peer)."""
+
+    def __init__(self):
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+
+    async def recv(self):
+        return await self.inbox.get()
+
+    def send(self, frame_id, pdu, peer):
+        self.outbox.put_nowait((encode_reply(frame_id, pdu), peer))
+
+
+class _DatagramQueue(asyncio.DatagramProtocol):
+    def __init__(self, queue):
+        self.queue = queue
+
+    def datagram_received(self, data, addr):
+        self.queue.put_nowait((data, addr))
+
+
+class UDPFrameTransport(FrameTransport):
+    """Local stand-in for the cyclic network, one frame per datagram.
+    Replies are sent back to the address a frame came from."""
+
+    def __init__(self, transport, queue):
+        self.transport = transport
+        self.queue = queue
+
+    @classmethod
+    async def create(cls, host="127.0.0.1", port=34962):
+        queue = asyncio.Queue()
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _DatagramQueue(queue), local_addr=(host, port)
+        )
+        return cls(transport, queue)
+
+    @property
+    def address(self):
+        return self.transport.get_extra_info("sockname")
+
+    async def recv(self):
+        return await self.queue.get()
+
+    def send(self, frame_id, pdu, peer):
+        self.transport.sendto(encode_reply(frame_id, pdu), peer)
+
+    def close(self):
+        self.transport.close()